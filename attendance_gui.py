@@ -12,10 +12,13 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 import os
+import sys
 from PIL import Image, ImageTk
 import subprocess
 import threading
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # helper scripts run from here
+
 class AttendanceGUI:
     def __init__(self, root):
         self.root = root
@@ -548,10 +551,7 @@ class AttendanceGUI:
         """Launch student registration"""
         def run_registration():
             try:
-                subprocess.run([
-                    '/Users/sahadchad/Desktop/smart-face-attendance-system-main/.venv/bin/python',
-                    'student_db_improved.py'
-                ], cwd='/Users/sahadchad/Desktop/smart-face-attendance-system-main')
+                subprocess.run([sys.executable, 'student_db_improved.py'], cwd=BASE_DIR)
                 # Refresh data after registration
                 self.root.after(1000, self.refresh_data)
             except Exception as e:
@@ -564,10 +564,7 @@ class AttendanceGUI:
         """Launch attendance system"""
         def run_attendance():
             try:
-                subprocess.run([
-                    '/Users/sahadchad/Desktop/smart-face-attendance-system-main/.venv/bin/python',
-                    'main_simplified.py'
-                ], cwd='/Users/sahadchad/Desktop/smart-face-attendance-system-main')
+                subprocess.run([sys.executable, 'main_simplified.py'], cwd=BASE_DIR)
                 # Refresh data after attendance
                 self.root.after(1000, self.refresh_data)
             except Exception as e:
@@ -616,10 +613,10 @@ class AttendanceGUI:
         
         if result:
             try:
-                subprocess.run([
-                    '/Users/sahadchad/Desktop/smart-face-attendance-system-main/.venv/bin/python',
-                    'reset_database.py'
-                ], cwd='/Users/sahadchad/Desktop/smart-face-attendance-system-main')
+                # Already confirmed above, so answer the script's two prompts
+                subprocess.run([sys.executable, 'reset_database.py'], cwd=BASE_DIR,
+                               input='yes\nDELETE\n', stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, text=True)
                 
                 self.refresh_data()
                 messagebox.showinfo("Success", "Database cleared successfully")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Attendance Log
+Append-only writer for the attendance CSV files used by the recognition scripts
+"""
+import csv
+import os
+from datetime import datetime
+
+ATTENDANCE_CSV = "Attendance/Attendance_.csv"
+LATE_CSV = "Attendance/late_attendance_record.csv"
+CSV_HEADER = ["Name", "Time", "Date"]
+LATE_HOUR = 9  # arrivals from 09:00 on are late
+
+def _open_for_append(path):
+    """Open a CSV for appending, (re)writing the header if it is missing or outdated"""
+    try:
+        with open(path, newline='') as f:
+            header = next(csv.reader(f), None)
+    except FileNotFoundError:
+        header = None
+
+    if header != CSV_HEADER:
+        if header is not None:
+            print(f"📝 Updating CSV format for {path}")
+        with open(path, 'w', newline='') as f:
+            csv.writer(f, lineterminator='\n').writerow(CSV_HEADER)
+
+    # Line-buffered so every row reaches the dashboard as soon as it is written
+    return open(path, 'a', newline='', buffering=1)
+
+class AttendanceLog:
+    """Appends attendance rows and remembers who is already marked on each day"""
+
+    def __init__(self, csv_file=ATTENDANCE_CSV, late_file=LATE_CSV):
+        os.makedirs(os.path.dirname(csv_file), exist_ok=True)
+        self._attendance_file = _open_for_append(csv_file)
+        self._late_file = _open_for_append(late_file)
+        self._attendance_writer = csv.writer(self._attendance_file, lineterminator='\n')
+        self._late_writer = csv.writer(self._late_file, lineterminator='\n')
+
+        # One pass over the existing log; after that the duplicate check is a set lookup
+        with open(csv_file, newline='') as f:
+            self.marked = {(row['Name'], row['Date']) for row in csv.DictReader(f)}
+
+    def mark(self, name):
+        """Record a student as present; returns (newly_marked, is_late, time string)"""
+        now = datetime.now()
+        current_date = now.strftime("%d-%m-%Y")
+        current_time_str = now.strftime("%H:%M:%S")
+
+        if (name, current_date) in self.marked:
+            return False, False, current_time_str
+
+        row = [name, current_time_str, current_date]
+        self._attendance_writer.writerow(row)
+        self.marked.add((name, current_date))
+
+        is_late = now.hour >= LATE_HOUR
+        if is_late:
+            self._late_writer.writerow(row)
+        return True, is_late, current_time_str
+
+    def close(self):
+        """Close both CSV files"""
+        self._attendance_file.close()
+        self._late_file.close()
@@ -408,9 +408,9 @@ def main():
         
         # Process detected faces
         for (x, y, w, h) in faces:
-            # Crop and resize face
-            face_crop = frame[y:y+h, x:x+w]
-            face_resized = cv2.resize(face_crop, (50, 50))
+            # Crop from the gray frame: 50x50 grayscale samples are a third of the BGR size
+            face_crop = gray[y:y+h, x:x+w]
+            face_resized = cv2.resize(face_crop, (50, 50), interpolation=cv2.INTER_AREA)
             
             # Save face sample every 0.5 seconds to avoid duplicates
             if current_time - last_save_time > 0.5:
@@ -3,25 +3,74 @@
 Smart Face Attendance System - Web Dashboard
 A modern, responsive web interface for managing attendance and viewing reports
 """
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, render_template, jsonify, request, send_file, Response, stream_with_context
 import pandas as pd
 import sqlite3
 import json
 from datetime import datetime, timedelta
-import plotly
-import plotly.graph_objs as go
-import plotly.express as px
 import os
+import sys
 import subprocess
 import threading
-import cv2
 import time
+import queue
+import atexit
+from contextlib import contextmanager
+from reset_database import backup_attendance_data, clear_attendance_files
+
+try:
+    import pyarrow  # noqa: F401 - optional, enables the Parquet sidecar cache
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
 
 app = Flask(__name__)
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # helper scripts run from here
+
+DB_PATH = 'data/attendance.db'
+# CSV mirror tables live in their own file: writing them must not touch attendance.db,
+# whose mtime keys main_improved's LBPH cache and whose changes are pushed to dashboards
+DASHBOARD_DB_PATH = 'data/dashboard.db'
+DB_POOL_SIZE = 4  # idle connections kept open between requests
+ATTENDANCE_CSV = 'Attendance/Attendance_.csv'
+LATE_CSV = 'Attendance/late_attendance_record.csv'
+CSV_DTYPES = {'Name': 'string', 'Time': 'string', 'Date': 'string'}  # skips type inference
+# Blank cells are read as '' (keep_default_na=False): pd.NA would break jsonify and SQLite binds
+PID_FILE = 'run/attendance.pid'  # lockfile holding the running attendance system's PID
+ATTENDANCE_LOG = 'run/attendance.log'  # output of the attendance system process
+REGISTRATION_LOG = 'run/registration.log'  # output of the registration worker
+
+# Files whose changes are pushed to open dashboards over /api/stream
+WATCHED_FILES = (
+    DB_PATH,
+    DB_PATH + '-wal',
+    ATTENDANCE_CSV,
+    LATE_CSV,
+)
+STATS_TTL = 1.0  # seconds a computed /api/stats result is reused
+STREAM_POLL_INTERVAL = 2  # seconds between file change checks
+STREAM_KEEPALIVE = 15  # seconds between keepalive comments on idle streams
+
 class AttendanceWebApp:
     def __init__(self):
         self.app = app
+        self._change_cond = threading.Condition()
+        self._data_version = 0
+        self._watcher_started = False
+        self._db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+        self._csv_cache = {}  # path -> ((mtime_ns, size), DataFrame, {derived name: value})
+        self._csv_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced = {}  # CSV path -> ((inode, mtime_ns, size), rows) last copied into SQLite
+        self._attendance_process = None
+        self._stats_cache = (0.0, None)  # (monotonic time computed, stats)
+        self._stats_lock = threading.Lock()
+        self._start_lock = threading.Lock()  # serializes lockfile check and claim
+        self._reg_proc = None  # long-lived `web_register.py --serve` worker
+        self._reg_lock = threading.Lock()
+        atexit.register(self.close_connections)
+        atexit.register(self.stop_registration_worker)
         self.setup_routes()
         
     def setup_routes(self):
@@ -41,6 +90,13 @@ class AttendanceWebApp:
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
         
+        @self.app.route('/api/stream')
+        def stream():
+            """Push stats and attendance updates as Server-Sent Events"""
+            return Response(stream_with_context(self.event_stream()),
+                            mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        
         @self.app.route('/api/students')
         def get_students():
             """Get students data"""
@@ -83,7 +139,8 @@ class AttendanceWebApp:
                 if self.student_exists(student_name):
                     return jsonify({'error': f'Student "{student_name}" already exists'}), 400
                 
-                self.start_registration(student_name)
+                if not self.start_registration(student_name):
+                    return jsonify({'error': 'Failed to start registration'}), 500
                 return jsonify({'success': True, 'message': f'Registration started for {student_name}'})
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
@@ -113,103 +170,259 @@ class AttendanceWebApp:
         def export_report():
             """Export attendance report"""
             try:
-                filename = self.export_attendance_report()
-                return send_file(filename, as_attachment=True)
+                return self.export_attendance_report()
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
     
+    def _open_connection(self):
+        """Open a tuned SQLite connection (WAL, relaxed fsync, larger page cache) with the mirror DB attached"""
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+        conn.execute("ATTACH DATABASE ? AS dashboard", (DASHBOARD_DB_PATH,))
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA dashboard.journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA dashboard.synchronous=NORMAL;
+            PRAGMA busy_timeout=5000;
+            PRAGMA cache_size=-20000;
+            CREATE TABLE IF NOT EXISTS dashboard.attendance
+                (name TEXT NOT NULL,
+                 time TEXT,
+                 date TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS dashboard.idx_attendance_date ON attendance(date);
+            CREATE INDEX IF NOT EXISTS dashboard.idx_attendance_name ON attendance(name);
+            CREATE TABLE IF NOT EXISTS dashboard.late_attendance
+                (name TEXT NOT NULL,
+                 date TEXT NOT NULL,
+                 PRIMARY KEY (name, date)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS dashboard.idx_late_attendance_date ON late_attendance(date);
+        """)
+        return conn
+    
+    @contextmanager
+    def _conn(self):
+        """Borrow a pooled database connection for the duration of a with-block"""
+        try:
+            conn = self._db_pool.get_nowait()
+        except queue.Empty:
+            conn = self._open_connection()
+        try:
+            yield conn
+        finally:
+            try:
+                self._db_pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    def close_connections(self):
+        """Close every idle pooled connection"""
+        while True:
+            try:
+                self._db_pool.get_nowait().close()
+            except queue.Empty:
+                break
+    
+    def _read_csv_cached(self, path):
+        """Read a CSV, re-parsing only when its mtime or size changed"""
+        # Cached frames are shared between requests; callers must not modify them in place
+        try:
+            st = os.stat(path)
+        except OSError:
+            return pd.DataFrame()
+        key = (st.st_mtime_ns, st.st_size)
+        
+        with self._csv_lock:
+            cached = self._csv_cache.get(path)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            df = self._load_csv(path, st.st_mtime_ns)
+            self._csv_cache[path] = (key, df, {})
+            return df
+    
+    def _csv_derived(self, path, name, compute):
+        """Memoize compute(df) for a cached CSV until the file changes"""
+        df = self._read_csv_cached(path)
+        with self._csv_lock:
+            cached = self._csv_cache.get(path)
+            if cached is None or cached[1] is not df:
+                return compute(df)
+            derived = cached[2]
+            if name not in derived:
+                derived[name] = compute(df)
+            return derived[name]
+    
+    def _load_csv(self, path, csv_mtime_ns):
+        """Load a CSV through its Parquet sidecar when pyarrow is available"""
+        if not HAVE_PYARROW:
+            return pd.read_csv(path, dtype=CSV_DTYPES, keep_default_na=False)
+        
+        sidecar = os.path.splitext(path)[0] + '.parquet'
+        try:
+            if os.stat(sidecar).st_mtime_ns >= csv_mtime_ns:
+                # Caches written before blanks were kept as '' may still hold NA
+                return pd.read_parquet(sidecar, engine='pyarrow').fillna('')
+        except OSError:
+            pass
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable Parquet cache {sidecar}: {e}")
+        
+        try:
+            # Arrow's multithreaded parser; the C parser below tolerates ragged rows
+            df = pd.read_csv(path, engine='pyarrow', dtype=CSV_DTYPES, keep_default_na=False)
+        except Exception:
+            df = pd.read_csv(path, dtype=CSV_DTYPES, keep_default_na=False)
+        try:
+            # Write-then-rename so concurrent workers never read a half-written file
+            tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+            df.to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+            os.replace(tmp_path, sidecar)
+        except Exception as e:
+            print(f"⚠️  Could not write Parquet cache {sidecar}: {e}")
+        return df
+    
+    def notify_data_changed(self):
+        """Drop cached stats and wake up every open event stream"""
+        with self._stats_lock:
+            self._stats_cache = (0.0, None)
+        with self._change_cond:
+            self._data_version += 1
+            self._change_cond.notify_all()
+    
+    def _files_signature(self):
+        """Cheap fingerprint of the watched files (one stat() each)"""
+        signature = []
+        for path in WATCHED_FILES:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def _watch_data_files(self):
+        """Background loop that turns file changes into stream events"""
+        last_signature = self._files_signature()
+        while True:
+            time.sleep(STREAM_POLL_INTERVAL)
+            signature = self._files_signature()
+            if signature != last_signature:
+                last_signature = signature
+                self.notify_data_changed()
+    
+    def _ensure_watcher(self):
+        """Start the file watcher the first time a client subscribes"""
+        with self._change_cond:
+            if self._watcher_started:
+                return
+            self._watcher_started = True
+        threading.Thread(target=self._watch_data_files, daemon=True).start()
+    
+    def event_stream(self):
+        """Yield SSE messages: current data on connect, then on every change"""
+        self._ensure_watcher()
+        version = None
+        while True:
+            with self._change_cond:
+                changed = self._change_cond.wait_for(lambda: self._data_version != version,
+                                                     timeout=STREAM_KEEPALIVE)
+                current_version = self._data_version
+            
+            if not changed:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            
+            version = current_version
+            yield f"event: stats\ndata: {json.dumps(self.get_quick_stats())}\n\n"
+            yield f"event: attendance\ndata: {json.dumps(self.get_attendance_data())}\n\n"
+    
     def get_quick_stats(self):
-        """Get quick statistics for dashboard"""
+        """Get quick statistics for dashboard, reused for STATS_TTL to absorb polling"""
+        with self._stats_lock:
+            computed_at, stats = self._stats_cache
+            if stats is not None and time.monotonic() - computed_at < STATS_TTL:
+                return stats
+            stats = self._compute_quick_stats()
+            if 'error' not in stats:
+                self._stats_cache = (time.monotonic(), stats)
+            return stats
+    
+    def _compute_quick_stats(self):
+        """Compute the dashboard statistics from the database and CSVs"""
         try:
-            # Database stats
-            conn = sqlite3.connect('data/attendance.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(DISTINCT name) FROM faces")
-            student_count = cursor.fetchone()[0]
-            cursor.execute("SELECT COUNT(*) FROM faces")
-            face_samples = cursor.fetchone()[0]
-            conn.close()
+            # Database stats: both counters in one round trip
+            with self._conn() as conn:
+                student_count, face_samples = conn.execute(
+                    "SELECT COUNT(DISTINCT name), COUNT(*) FROM faces").fetchone()
             
             # Attendance stats
-            if os.path.exists('Attendance/Attendance_.csv'):
-                df = pd.read_csv('Attendance/Attendance_.csv')
-                late_df = pd.read_csv('Attendance/late_attendance_record.csv') if os.path.exists('Attendance/late_attendance_record.csv') else pd.DataFrame()
-                
-                today = datetime.now().strftime("%d-%m-%Y")
-                today_attendance = df[df['Date'] == today] if not df.empty else pd.DataFrame()
-                today_late = late_df[late_df['Date'] == today] if not late_df.empty else pd.DataFrame()
-                
-                return {
-                    'students_registered': student_count,
-                    'face_samples': face_samples,
-                    'today_attendance': len(today_attendance),
-                    'today_late': len(today_late),
-                    'total_records': len(df),
-                    'unique_attendees': df['Name'].nunique() if not df.empty else 0
-                }
-            else:
-                return {
-                    'students_registered': student_count,
-                    'face_samples': face_samples,
-                    'today_attendance': 0,
-                    'today_late': 0,
-                    'total_records': 0,
-                    'unique_attendees': 0
-                }
+            df = self._read_csv_cached(ATTENDANCE_CSV)
+            late_df = self._read_csv_cached(LATE_CSV)
+            today = datetime.now().strftime("%d-%m-%Y")
+            
+            # NumPy reductions rather than materializing filtered frames
+            return {
+                'students_registered': student_count,
+                'face_samples': face_samples,
+                'today_attendance': int((df['Date'].to_numpy() == today).sum()) if not df.empty else 0,
+                'today_late': int((late_df['Date'].to_numpy() == today).sum()) if not late_df.empty else 0,
+                'total_records': len(df),
+                'unique_attendees': self._csv_derived(
+                    ATTENDANCE_CSV, 'unique_names',
+                    lambda frame: int(frame['Name'].nunique()) if not frame.empty else 0)
+            }
         except Exception as e:
             return {'error': str(e)}
     
     def get_students_data(self):
         """Get students data"""
         try:
-            conn = sqlite3.connect('data/attendance.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT name, COUNT(*) as samples FROM faces GROUP BY name ORDER BY name")
-            students = cursor.fetchall()
-            conn.close()
-            
-            # Get last seen data
-            attendance_df = pd.read_csv('Attendance/Attendance_.csv') if os.path.exists('Attendance/Attendance_.csv') else pd.DataFrame()
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT name, COUNT(*) as samples FROM faces GROUP BY name ORDER BY name")
+                students = cursor.fetchall()
             
-            result = []
-            for name, samples in students:
-                if not attendance_df.empty:
-                    student_records = attendance_df[attendance_df['Name'] == name]
-                    last_seen = student_records.iloc[-1]['Date'] if not student_records.empty else "Never"
-                else:
-                    last_seen = "Never"
-                
-                result.append({
-                    'name': name,
-                    'samples': samples,
-                    'last_seen': last_seen
-                })
+            # Get last seen data: one group-by pass over the log instead of a filter per student
+            attendance_df = self._read_csv_cached(ATTENDANCE_CSV)
+            if not attendance_df.empty:
+                last_seen_map = attendance_df.groupby('Name', sort=False)['Date'].last().to_dict()
+            else:
+                last_seen_map = {}
             
-            return result
+            return [{
+                'name': name,
+                'samples': samples,
+                'last_seen': last_seen_map.get(name, "Never")
+            } for name, samples in students]
         except Exception as e:
             return {'error': str(e)}
     
     def get_attendance_data(self, date_filter=None):
         """Get attendance data"""
         try:
-            if not os.path.exists('Attendance/Attendance_.csv'):
+            if not os.path.exists(ATTENDANCE_CSV):
                 return []
             
-            df = pd.read_csv('Attendance/Attendance_.csv')
-            late_df = pd.read_csv('Attendance/late_attendance_record.csv') if os.path.exists('Attendance/late_attendance_record.csv') else pd.DataFrame()
+            df = self._read_csv_cached(ATTENDANCE_CSV)
             
             if date_filter:
                 df = df[df['Date'] == date_filter]
             
+            # (name, date) keys of late arrivals, from the indexed late_attendance table
+            try:
+                late_keys = self._late_keys(date_filter)
+            except sqlite3.Error as e:
+                print(f"⚠️  Falling back to the late CSV: {e}")
+                late_df = self._read_csv_cached(LATE_CSV)
+                late_keys = set(zip(late_df['Name'], late_df['Date'])) if not late_df.empty else frozenset()
+            
             result = []
-            for _, row in df.iterrows():
-                is_late = not late_df[(late_df['Name'] == row['Name']) & 
-                                     (late_df['Date'] == row['Date'])].empty if not late_df.empty else False
-                
+            for name, time_str, date in zip(df['Name'].tolist(), df['Time'].tolist(), df['Date'].tolist()):
+                is_late = (name, date) in late_keys
                 result.append({
-                    'name': row['Name'],
-                    'time': row['Time'],
-                    'date': row['Date'],
+                    'name': name,
+                    'time': time_str,
+                    'date': date,
                     'status': 'Late' if is_late else 'On Time',
                     'status_color': 'danger' if is_late else 'success'
                 })
@@ -221,92 +434,155 @@ class AttendanceWebApp:
     def get_charts_data(self):
         """Get data for charts"""
         try:
-            if not os.path.exists('Attendance/Attendance_.csv'):
+            if not os.path.exists(ATTENDANCE_CSV):
                 return {'error': 'No attendance data available'}
             
-            df = pd.read_csv('Attendance/Attendance_.csv')
-            if df.empty:
+            try:
+                daily_counts, student_counts = self._chart_counts_sql()
+            except sqlite3.Error as e:
+                print(f"⚠️  Falling back to pandas for chart data: {e}")
+                daily_counts, student_counts = self._chart_counts_frame()
+            if not daily_counts:
                 return {'error': 'No attendance data available'}
             
-            # Daily attendance chart
-            daily_counts = df.groupby('Date').size().reset_index(name='count')
-            daily_chart = {
-                'data': [{
-                    'x': daily_counts['Date'].tolist(),
-                    'y': daily_counts['count'].tolist(),
-                    'type': 'bar',
-                    'name': 'Daily Attendance',
-                    'marker': {'color': '#3498db'}
-                }],
-                'layout': {
-                    'title': 'Daily Attendance Count',
-                    'xaxis': {'title': 'Date'},
-                    'yaxis': {'title': 'Students Present'}
-                }
-            }
-            
-            # Student attendance frequency
-            student_counts = df['Name'].value_counts().head(10)
-            student_chart = {
-                'data': [{
-                    'x': student_counts.values.tolist(),
-                    'y': student_counts.index.tolist(),
-                    'type': 'bar',
-                    'orientation': 'h',
-                    'name': 'Student Attendance',
-                    'marker': {'color': '#27ae60'}
-                }],
-                'layout': {
-                    'title': 'Top 10 Students by Attendance',
-                    'xaxis': {'title': 'Days Present'},
-                    'yaxis': {'title': 'Students'}
-                }
-            }
-            
+            # Raw arrays only; the dashboard builds the Plotly traces and layout
             return {
-                'daily_chart': daily_chart,
-                'student_chart': student_chart
+                'daily': {
+                    'dates': [date for date, _ in daily_counts],
+                    'counts': [count for _, count in daily_counts]
+                },
+                'students': {
+                    'names': [name for name, _ in student_counts],
+                    'counts': [count for _, count in student_counts]
+                }
             }
         except Exception as e:
             return {'error': str(e)}
     
+    def _sync_csv_table(self, path, table, columns, insert_sql):
+        """Mirror a CSV into a dashboard table, inserting only the rows appended since the last sync"""
+        try:
+            st = os.stat(path)
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            key = None
+        
+        with self._sync_lock:
+            if path in self._synced and self._synced[path][0] == key:
+                return
+            synced_key, synced_rows = self._synced.get(path, (None, 0))
+            
+            df = self._read_csv_cached(path)
+            # The CSVs are append-only: if the same file only grew, the mirrored rows are still valid
+            appended = (synced_key is not None and key is not None and key[0] == synced_key[0]
+                        and key[2] >= synced_key[2] and len(df) >= synced_rows)
+            first_row = synced_rows if appended else 0
+            rows = []
+            if not df.empty:
+                new_rows = df.iloc[first_row:]
+                rows = list(zip(*(new_rows[column].tolist() for column in columns)))
+            
+            with self._conn() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if not appended:
+                        conn.execute(f"DELETE FROM {table}")
+                    conn.executemany(insert_sql, rows)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            self._synced[path] = (key, len(df))
+    
+    def _sync_attendance_table(self):
+        """Mirror the attendance CSV into the attendance table whenever the CSV changes"""
+        self._sync_csv_table(ATTENDANCE_CSV, "dashboard.attendance", ('Name', 'Time', 'Date'),
+                             "INSERT INTO dashboard.attendance (name, time, date) VALUES (?, ?, ?)")
+    
+    def _sync_late_table(self):
+        """Mirror the late CSV's (name, date) pairs into late_attendance whenever it changes"""
+        self._sync_csv_table(LATE_CSV, "dashboard.late_attendance", ('Name', 'Date'),
+                             "INSERT OR IGNORE INTO dashboard.late_attendance (name, date) VALUES (?, ?)")
+    
+    def _late_keys(self, date_filter=None):
+        """Set of late (name, date) pairs, optionally limited to one date"""
+        self._sync_late_table()
+        with self._conn() as conn:
+            if date_filter:
+                rows = conn.execute("SELECT name, date FROM dashboard.late_attendance WHERE date = ?", (date_filter,))
+            else:
+                rows = conn.execute("SELECT name, date FROM dashboard.late_attendance")
+            return set(rows.fetchall())
+    
+    def _chart_counts_sql(self):
+        """Per-day and top-10 per-student attendance counts, aggregated by SQLite"""
+        self._sync_attendance_table()
+        with self._conn() as conn:
+            daily_counts = conn.execute(
+                "SELECT date, COUNT(*) FROM dashboard.attendance GROUP BY date ORDER BY date").fetchall()
+            student_counts = conn.execute(
+                "SELECT name, COUNT(*) AS c FROM dashboard.attendance GROUP BY name ORDER BY c DESC, name LIMIT 10").fetchall()
+        return daily_counts, student_counts
+    
+    def _chart_counts_frame(self):
+        """Same counts as _chart_counts_sql, computed from the cached DataFrame"""
+        df = self._read_csv_cached(ATTENDANCE_CSV)
+        if df.empty:
+            return [], []
+        daily = df.groupby('Date').size()
+        top = df['Name'].value_counts().head(10)
+        return (list(zip(daily.index.tolist(), daily.tolist())),
+                list(zip(top.index.tolist(), top.tolist())))
+    
     def student_exists(self, student_name):
         """Check if student already exists in database"""
         try:
-            conn = sqlite3.connect('data/attendance.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM faces WHERE name = ?", (student_name,))
-            count = cursor.fetchone()[0]
-            conn.close()
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM faces WHERE name = ?", (student_name,))
+                count = cursor.fetchone()[0]
             return count > 0
         except Exception:
             return False
     
+    def _registration_worker(self):
+        """Return the registration worker process, (re)starting it if needed"""
+        if self._reg_proc is None or self._reg_proc.poll() is not None:
+            # Started once; the interpreter, OpenCV and the face detector stay loaded
+            os.makedirs(os.path.dirname(REGISTRATION_LOG), exist_ok=True)
+            with open(REGISTRATION_LOG, 'a') as log:
+                self._reg_proc = subprocess.Popen(
+                    [sys.executable, '-u', 'web_register.py', '--serve'], cwd=BASE_DIR,
+                    stdin=subprocess.PIPE, stdout=log, stderr=subprocess.STDOUT, text=True)
+        return self._reg_proc
+    
     def start_registration(self, student_name):
-        """Start student registration using external script"""
-        def run_registration():
+        """Queue a student registration on the registration worker; returns False if it could not be queued"""
+        print(f"🎯 Starting registration for: {student_name}")
+        # One name per line; fold any embedded newlines into spaces
+        line = ' '.join(student_name.split()) + '\n'
+        with self._reg_lock:
+            for attempt in range(2):
+                try:
+                    worker = self._registration_worker()
+                    worker.stdin.write(line)
+                    worker.stdin.flush()
+                    return True
+                except (OSError, ValueError) as ex:
+                    # Broken pipe or closed stdin: restart the worker and try once more
+                    print(f"❌ Registration error: {ex}")
+                    if self._reg_proc is not None:
+                        self._reg_proc.kill()
+                        self._reg_proc = None
+        return False
+    
+    def stop_registration_worker(self):
+        """Let the registration worker finish its queue and exit"""
+        if self._reg_proc is not None and self._reg_proc.poll() is None:
             try:
-                print(f"🎯 Starting registration for: {student_name}")
-                
-                # Use the dedicated web_register.py script
-                result = subprocess.run([
-                    '/Users/sahadchad/Desktop/smart-face-attendance-system-main/.venv/bin/python',
-                    'web_register.py',
-                    student_name
-                ], cwd='/Users/sahadchad/Desktop/smart-face-attendance-system-main',
-                   capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    print(f"✅ Registration completed successfully for {student_name}")
-                else:
-                    print(f"❌ Registration failed for {student_name}")
-                    if result.stderr:
-                        print(f"Error: {result.stderr}")
-                
-            except Exception as ex:
-                print(f"❌ Registration error: {ex}")
-        
-        threading.Thread(target=run_registration, daemon=True).start()
+                self._reg_proc.stdin.close()
+            except OSError:
+                pass
     
     def start_attendance_system(self):
         """Start improved attendance system in background"""
@@ -314,66 +590,110 @@ class AttendanceWebApp:
             print("🎯 Starting attendance system...")
             
             # Check if the main_improved.py file exists
-            main_script = '/Users/sahadchad/Desktop/smart-face-attendance-system-main/main_improved.py'
+            main_script = os.path.join(BASE_DIR, 'main_improved.py')
             if not os.path.exists(main_script):
                 print("❌ Error: main_improved.py not found!")
                 return False
             
-            # Check if attendance system is already running
-            try:
-                result = subprocess.run(['pgrep', '-f', 'main_improved.py'], 
-                                      capture_output=True, text=True)
-                if result.stdout.strip():
+            with self._start_lock:
+                # Check if attendance system is already running
+                if self.attendance_system_running():
                     print("⚠️  Attendance system is already running!")
                     return True  # Return success since it's already running
-            except:
-                pass  # pgrep might not be available on all systems
-            
-            def run_attendance():
+                
+                # Claim the lockfile atomically so concurrent clicks start one process
+                os.makedirs(os.path.dirname(PID_FILE), exist_ok=True)
                 try:
-                    # Start the attendance system
-                    process = subprocess.Popen([
-                        '/Users/sahadchad/Desktop/smart-face-attendance-system-main/.venv/bin/python',
-                        'main_improved.py'
-                    ], cwd='/Users/sahadchad/Desktop/smart-face-attendance-system-main',
-                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                    
-                    print(f"✅ Attendance system started with PID: {process.pid}")
-                    
-                except Exception as e:
-                    print(f"❌ Error running attendance system: {e}")
-            
-            # Start in background thread
-            thread = threading.Thread(target=run_attendance, daemon=True)
-            thread.start()
-            
-            # Give it a moment to start
-            time.sleep(0.5)
+                    pid_file = open(PID_FILE, 'x')
+                except FileExistsError:
+                    print("⚠️  Attendance system is already starting!")
+                    return True
+                
+                with pid_file:
+                    try:
+                        # Start the attendance system; its output goes to a log, never an unread pipe
+                        with open(ATTENDANCE_LOG, 'a') as log:
+                            process = subprocess.Popen(
+                                [sys.executable, '-u', 'main_improved.py'], cwd=BASE_DIR,
+                                stdout=log, stderr=subprocess.STDOUT)
+                    except Exception:
+                        pid_file.close()
+                        os.remove(PID_FILE)
+                        raise
+                    pid_file.write(str(process.pid))
+                
+                self._attendance_process = process
+            print(f"✅ Attendance system started with PID: {process.pid}")
             return True
             
         except Exception as e:
             print(f"❌ Error starting attendance system: {e}")
             return False
     
+    def attendance_system_running(self):
+        """Check the PID lockfile, removing it if its process has exited"""
+        try:
+            with open(PID_FILE) as f:
+                pid = int(f.read().strip())
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError):
+            pid = None  # empty or unreadable lockfile left by an interrupted start
+        
+        if pid is not None:
+            process = self._attendance_process
+            if process is not None and process.pid == pid:
+                # Our own child: poll() also reaps it, so it cannot linger as a zombie
+                alive = process.poll() is None
+            else:
+                try:
+                    os.kill(pid, 0)
+                    alive = True
+                except ProcessLookupError:
+                    alive = False
+                except PermissionError:
+                    alive = True  # exists, owned by another user
+            if alive:
+                return True
+        
+        try:
+            os.remove(PID_FILE)
+        except FileNotFoundError:
+            pass
+        return False
+    
     def clear_database_data(self):
         """Clear database"""
-        subprocess.run([
-            '/Users/sahadchad/Desktop/smart-face-attendance-system-main/.venv/bin/python',
-            'reset_database.py'
-        ], cwd='/Users/sahadchad/Desktop/smart-face-attendance-system-main', input='yes\nDELETE\n', text=True)
+        backup_attendance_data()
+        
+        # One transaction for every table, then reclaim the face blob pages
+        with self._sync_lock, self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM faces")
+                conn.execute("DELETE FROM dashboard.attendance")
+                conn.execute("DELETE FROM dashboard.late_attendance")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._synced.clear()
+            conn.execute("VACUUM")
+        
+        clear_attendance_files()
+        self.notify_data_changed()
     
     def export_attendance_report(self):
         """Export attendance report"""
-        if not os.path.exists('Attendance/Attendance_.csv'):
+        if not os.path.exists(ATTENDANCE_CSV):
             raise Exception("No attendance data to export")
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"attendance_report_{timestamp}.csv"
-        
-        df = pd.read_csv('Attendance/Attendance_.csv')
-        df.to_csv(filename, index=False)
         
-        return filename
+        # The log is already the report: stream it as-is under a timestamped name
+        return send_file(os.path.abspath(ATTENDANCE_CSV), as_attachment=True,
+                         download_name=f"attendance_report_{timestamp}.csv",
+                         mimetype='text/csv')
 
 def main():
     web_app = AttendanceWebApp()
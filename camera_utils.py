@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Camera Utilities
+Detects available cameras and checks that they deliver frames
+"""
+import cv2
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_CAMERA_INDEX = 10  # indices 0..9 are probed
+MJPG_MIN_WIDTH = 1920  # from 1080p up, raw frames exceed USB bandwidth; use MJPG
+WARMUP_TIMEOUT = 3.0  # seconds to wait for a camera's first usable frame
+
+def camera_backend():
+    """Capture backend for this OS, so each probe skips backend autodetection"""
+    system = platform.system()
+    if system == "Darwin":  # macOS
+        return cv2.CAP_AVFOUNDATION
+    if system == "Windows":
+        return cv2.CAP_DSHOW
+    if system == "Linux":
+        return cv2.CAP_V4L2
+    return cv2.CAP_ANY
+
+def set_capture_format(cap):
+    """Prefer raw YUYV frames (no per-frame JPEG decode), falling back to MJPG"""
+    if cap.get(cv2.CAP_PROP_FRAME_WIDTH) < MJPG_MIN_WIDTH:
+        for code in ('YUYV', 'YUY2'):
+            fourcc = cv2.VideoWriter_fourcc(*code)
+            if cap.set(cv2.CAP_PROP_FOURCC, fourcc) and int(cap.get(cv2.CAP_PROP_FOURCC)) == fourcc:
+                return code
+    
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
+    return 'MJPG'
+
+def open_camera(index=0, width=640, height=480, fps=30):
+    """Open a camera on this OS's native backend with its pixel format set (check isOpened())"""
+    cap = cv2.VideoCapture(index, camera_backend())
+    if not cap.isOpened() or not cap.read()[0]:
+        # Native backend unavailable or not delivering frames: let OpenCV pick one
+        cap.release()
+        cap = cv2.VideoCapture(index)
+    if not cap.isOpened():
+        return cap
+    
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # always read a fresh frame, never a queued stale one
+    set_capture_format(cap)  # after the size: the format choice depends on the width
+    return cap
+
+def wait_for_camera(cap, timeout=WARMUP_TIMEOUT):
+    """Read until the camera delivers a non-black frame (or timeout); True once it is ready"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ret, frame = cap.read()
+        # Most drivers emit a few all-black frames while the sensor starts up
+        if ret and frame is not None and frame.mean() > 5:
+            return True
+        time.sleep(0.05)
+    return False
+
+def enable_raw_yuyv(cap):
+    """Switch off OpenCV's colour conversion; True if frames now arrive as raw (H, W, 2) YUYV"""
+    if set_capture_format(cap) in ('YUYV', 'YUY2') and cap.set(cv2.CAP_PROP_CONVERT_RGB, 0):
+        ret, frame = cap.read()
+        if ret and frame.ndim == 3 and frame.shape[2] == 2:
+            return True
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+    return False
+
+def split_yuyv(frame):
+    """Split a raw YUYV frame into its Y plane (the grayscale image) and a BGR frame"""
+    # frame[:, :, 0] would be a strided view that the cascade and resize copy again on every
+    # call; one explicit extraction gives them a contiguous plane instead
+    return cv2.extractChannel(frame, 0), cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_YUYV)
+
+def _probe(index):
+    """Return info about the camera at index, or None if it cannot deliver a frame"""
+    cap = cv2.VideoCapture(index, camera_backend())
+    try:
+        if not cap.isOpened():
+            return None
+
+        ret, frame = cap.read()
+        if not ret or frame is None:
+            return None
+
+        return {
+            'index': index,
+            'width': frame.shape[1],
+            'height': frame.shape[0],
+            'fps': cap.get(cv2.CAP_PROP_FPS),
+            'backend': cap.getBackendName()
+        }
+    finally:
+        cap.release()
+
+def _probe_works(index):
+    """Check whether the camera at index opens and delivers a frame"""
+    cap = cv2.VideoCapture(index, camera_backend())
+    try:
+        if not cap.isOpened():
+            return False
+        ret, _ = cap.read()
+        return ret
+    finally:
+        cap.release()
+
+def get_best_camera_index(max_index=MAX_CAMERA_INDEX):
+    """Return the first working camera index (0 is the built-in camera), or None"""
+    for index in range(max_index):
+        if _probe_works(index):
+            return index
+    return None
+
+def get_available_cameras(max_index=MAX_CAMERA_INDEX):
+    """Probe camera indices concurrently and return the working ones (diagnostics only)"""
+    # Each probe mostly waits on backend initialization, so run them side by side
+    with ThreadPoolExecutor(max_workers=max_index) as executor:
+        return [camera for camera in executor.map(_probe, range(max_index)) if camera]
+
+class FrameGrabber:
+    """Reads frames on a background thread, keeping only the newest one"""
+
+    def __init__(self, cap):
+        self.cap = cap
+        self._frame = None  # 1-slot buffer: a new frame replaces one not yet taken
+        self._frames_read = 0  # frames delivered by the camera so far
+        self.frame_number = 0  # camera sequence number of the frame last returned by read()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                self._stop.wait(0.01)
+                continue
+            with self._cond:
+                self._frames_read += 1
+                self._frame = frame
+                self._cond.notify()
+
+    def read(self, timeout=1.0):
+        """Take the newest frame, waiting up to timeout; same (ret, frame) shape as cap.read()"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame is not None, timeout)
+            frame, self._frame = self._frame, None
+            if frame is not None:
+                self.frame_number = self._frames_read
+        return frame is not None, frame
+
+    def stop(self):
+        """Stop the reader thread (the capture itself is released by the caller)"""
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+def main():
+    print("📷 Scanning for cameras...")
+    cameras = get_available_cameras()
+
+    if not cameras:
+        print("❌ No working cameras found. Please check:")
+        print("1. Camera is connected properly")
+        print("2. No other application is using the camera")
+        print("3. Camera permissions are granted to Terminal/Python")
+        return False
+
+    for camera in cameras:
+        print(f"✅ Camera {camera['index']}: {camera['width']}x{camera['height']} "
+              f"@ {camera['fps']:.0f} FPS ({camera['backend']})")
+    print(f"🎯 Best camera index: {get_best_camera_index()}")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Face Registration
+Capture loop shared by the registration scripts: collects 50x50 grayscale face
+samples from the camera and inserts them into the faces table
+"""
+import os
+import sqlite3
+import cv2
+import numpy as np
+from camera_utils import FrameGrabber, open_camera, wait_for_camera
+from face_samples import SAMPLE_SIZE, crop_sample
+from face_utils import USE_OPENCL, detect_half_scale
+
+DB_PATH = 'data/attendance.db'
+MAX_SAMPLES = 100
+DETECT_INTERVAL = 3  # run the cascade every Nth frame; boxes are reused in between
+MOTION_THRESHOLD = 2.0  # mean absolute gray-level change needed to re-detect
+SAVE_INTERVAL = 0.5  # seconds between saved samples, counted in frames
+MAX_READ_FAILURES = 5  # consecutive 1 s frame timeouts before giving up on the camera
+
+def open_faces_db(path=DB_PATH):
+    """Open the attendance database for bulk sample inserts, creating the faces table if needed"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, isolation_level='DEFERRED')
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute('''CREATE TABLE IF NOT EXISTS faces
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     name TEXT,
+                     face_data BLOB)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_faces_name ON faces(name)")
+    conn.commit()
+    return conn
+
+def capture_samples(cap, face_cascade, name, save_every):
+    """Show the camera and collect up to MAX_SAMPLES face samples until 'q'; returns them as (N, 50, 50)"""
+    # Samples are resized straight into one preallocated buffer
+    samples = np.empty((MAX_SAMPLES, SAMPLE_SIZE, SAMPLE_SIZE), dtype=np.uint8)
+    n_saved = 0
+    frame_count = 0
+    last_save_number = 0  # camera frame number of the last saved sample
+    faces = ()
+    detect_gray = None  # gray frame the current boxes were detected on
+    detect_count = 0  # frame_count of the frame the current boxes were detected on
+    read_failures = 0
+    
+    # Camera reads run on their own thread; detection always takes the newest frame
+    grabber = FrameGrabber(cap)
+    
+    while True:
+        ret, frame = grabber.read()
+        
+        if not ret or frame is None:
+            read_failures += 1
+            if read_failures >= MAX_READ_FAILURES:
+                print("❌ Error: Camera stopped delivering frames")
+                break
+            print("Warning: Could not read frame")
+            # Keep the window responsive so 'q' still works while the camera is stalled
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q') or key == ord('Q'):
+                break
+            continue
+        read_failures = 0
+        
+        frame_count += 1
+        
+        # Convert to grayscale (on the GPU/iGPU when OpenCL is available)
+        gray = cv2.cvtColor(cv2.UMat(frame) if USE_OPENCL else frame, cv2.COLOR_BGR2GRAY)
+        
+        # Save a sample every save_every camera frames to avoid duplicates
+        # (counted by the grabber, so the rate does not depend on how fast this loop runs)
+        save_due = grabber.frame_number - last_save_number >= save_every and n_saved < MAX_SAMPLES
+        
+        # Detect faces every few frames, and only if the picture changed since the last detection
+        # or a sample is due (a static scene must not keep saving crops from old boxes)
+        if frame_count % DETECT_INTERVAL == 0 and (
+                save_due or detect_gray is None
+                or cv2.mean(cv2.absdiff(gray, detect_gray))[0] >= MOTION_THRESHOLD):
+            # minSize 15 on the half-size frame = 30 px at full size
+            faces = detect_half_scale(
+                face_cascade,
+                gray,
+                scaleFactor=1.1,
+                minNeighbors=5,
+                minSize=(15, 15)
+            )
+            detect_gray = gray
+            detect_count = frame_count
+        
+        # Process detected faces
+        for (x, y, w, h) in faces:
+            # Save a 50x50 grayscale sample, only from boxes detected on this very frame
+            if save_due and detect_count == frame_count:
+                crop_sample(gray, (x, y, w, h), dst=samples[n_saved])
+                n_saved += 1
+                last_save_number = grabber.frame_number
+                save_due = False
+                print(f"Captured sample {n_saved}")
+            
+            # Draw rectangle around face
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+            cv2.putText(frame, "Face Detected", (x, y-10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        
+        # Add status information
+        cv2.putText(frame, f"Student: {name}", (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(frame, f"Samples: {n_saved}/{MAX_SAMPLES}", (10, 60),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(frame, "Press 'q' to finish", (10, 90),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        # Color coding for sample count
+        if n_saved < 30:
+            color = (0, 0, 255)  # Red
+            status = "Need more samples"
+        elif n_saved < 50:
+            color = (0, 255, 255)  # Yellow
+            status = "Getting better"
+        else:
+            color = (0, 255, 0)  # Green
+            status = "Good quality!"
+        
+        cv2.putText(frame, status, (10, 120),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        
+        # Show the frame
+        cv2.imshow(f'Registration: {name} - Press Q to finish', frame)
+        
+        # Handle key presses
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q') or key == ord('Q'):
+            break
+        
+        # Auto-stop at 100 samples
+        if n_saved >= MAX_SAMPLES:
+            print("✅ Reached 100 samples - stopping automatically")
+            break
+    
+    grabber.stop()
+    return samples[:n_saved]
+
+def register_into(cursor, name, face_cascade, save_interval=SAVE_INTERVAL, min_samples=1):
+    """Capture face samples for name and insert them through cursor (the caller commits); returns the count"""
+    # Initialize camera (AVFoundation on macOS, V4L2 on Linux; 640x480, 1-frame buffer)
+    cap = open_camera()
+    if not cap.isOpened():
+        print("❌ Error: Could not access camera. Please check:")
+        print("1. Camera is connected")
+        print("2. No other application is using the camera")
+        print("3. Camera permissions are granted")
+        return 0
+    
+    try:
+        # Give camera time to adjust (returns as soon as real frames arrive)
+        if not wait_for_camera(cap):
+            print("❌ Error: Camera not working properly")
+            return 0
+        print("✅ Camera is working!")
+        
+        print("🎥 Camera window will open now...")
+        print("📝 Instructions:")
+        print("   - Look directly at the camera")
+        print("   - Move your head slightly for different angles")
+        print("   - Press 'q' when you have enough samples (50+)")
+        print(f"   - The system will auto-stop at {MAX_SAMPLES} samples")
+        
+        # Rate-limit by frame count (camera FPS, 30 if the driver does not report it)
+        save_every = max(1, int((cap.get(cv2.CAP_PROP_FPS) or 30) * save_interval))
+        samples = capture_samples(cap, face_cascade, name, save_every)
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+    
+    if not len(samples):
+        print("❌ No face samples were collected")
+        return 0
+    if len(samples) < min_samples:
+        print(f"❌ Not enough samples collected ({len(samples)}). Need at least {min_samples}.")
+        return 0
+    
+    # memoryview rows bind as BLOBs straight from the buffer (no bytes copy per sample)
+    cursor.executemany('INSERT INTO faces (name, face_data) VALUES (?, ?)',
+                       ((name, memoryview(sample)) for sample in samples))
+    return len(samples)
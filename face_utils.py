@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Face Utilities
+Locates and loads the Haar face detector shared by the recognition and registration scripts
+and decides whether detection runs through OpenCL
+"""
+import os
+import cv2
+
+CASCADE_FILE = 'haarcascade_frontalface_default.xml'
+
+def cascade_path():
+    """Path of the frontal face cascade: the copy installed with OpenCV, else the one in this repo"""
+    # opencv-python wheels ship the cascades; that copy is already in the page cache
+    # whenever another OpenCV program has used it
+    data_dir = getattr(getattr(cv2, 'data', None), 'haarcascades', None)
+    if data_dir and os.path.exists(os.path.join(data_dir, CASCADE_FILE)):
+        return os.path.join(data_dir, CASCADE_FILE)
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), CASCADE_FILE)
+
+CASCADE_PATH = cascade_path()
+USE_OPENCL = cv2.ocl.haveOpenCL()  # run colour conversion/detection on the GPU/iGPU through the T-API
+
+_cascade = None
+
+def get_cascade():
+    """The frontal face cascade, parsed on first use and shared after that (check .empty())"""
+    global _cascade
+    if _cascade is None:
+        _cascade = cv2.CascadeClassifier(CASCADE_PATH)
+    return _cascade
+
+def detect_half_scale(cascade, gray, *args, **kwargs):
+    """Detect faces on a pyrDown'd copy of gray (sizes in half-scale pixels); boxes come back full scale"""
+    # A quarter of the pixels for every pyramid level the cascade scans
+    boxes = cascade.detectMultiScale(cv2.pyrDown(gray), *args, **kwargs)
+    return [tuple(2 * int(v) for v in box) for box in boxes]
@@ -1,48 +1,342 @@
 import cv2
+import os
 import sqlite3
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from sklearn.metrics.pairwise import cosine_similarity
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, time as dtime, timedelta
 import pyttsx3
 import torch
+import torch.nn.functional as F
 from facenet_pytorch import InceptionResnetV1
+from camera_utils import FrameGrabber, open_camera
+from face_samples import decode_bgr_samples
+from face_utils import get_cascade
 
 
-def speak(str1):
+def tts_worker():
+    """Speak queued messages on one long-lived engine, off the video loop"""
     engine = pyttsx3.init()
-    engine.say(str1)
-    engine.runAndWait()
+    for message in iter(tts_queue.get, None):
+        try:
+            engine.say(message)
+            engine.runAndWait()
+        except Exception as e:
+            print(f"Speech error: {e}")
+
+
+tts_queue = queue.Queue()
+threading.Thread(target=tts_worker, daemon=True).start()
+
+
+def speak(str1):
+    tts_queue.put(str1)
+
+
+# Run FaceNet on the GPU when there is one; let cuDNN/matmul pick their fastest kernels
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+torch.backends.cudnn.benchmark = True
+torch.set_float32_matmul_precision('high')
+
+# Let OpenCV use every core and, through UMat, OpenCL where the platform has it
+cv2.setUseOptimized(True)
+cv2.setNumThreads(os.cpu_count() or 1)
+cv2.ocl.setUseOpenCL(True)
+
+MAX_BATCH = 16  # most faces embedded in one forward pass
+DETECTION_SCALE = 2  # Haar detection runs on the frame downscaled by this factor
+KEYFRAME_INTERVAL = 3  # full detect + recognize every Nth frame; trackers fill the gaps
+MATCH_THRESHOLD = 0.7  # cosine similarity needed to accept a match
+MATCH_TILE = 1024  # stored embeddings compared per step when matching
+MATCH_CACHE_TTL = 2.0  # seconds a face crop's match is reused without re-embedding
+MATCH_CACHE_SIZE = 64  # most crop hashes remembered at once
+TRACK_IOU = 0.5  # overlap with a previous keyframe's box needed to continue its track
+CUTOFF_TIME = dtime(9, 0)  # lateness is measured from here
+LATE_CUTOFF_TIME = dtime(9, 5)  # arrivals after this must give a reason
+
+
+def compile_model(model):
+    """
+    Trace and freeze FaceNet into an optimized TorchScript graph
+
+    Args:
+        model (torch.nn.Module): FaceNet model in eval mode on `device`
+
+    Returns:
+        Frozen TorchScript module, or the eager model if compilation fails
+    """
+    example = torch.zeros(MAX_BATCH, 3, 160, 160, device=device)
+    try:
+        # Traced under the same autocast settings used for inference
+        with torch.no_grad(), torch.autocast(device_type=device, dtype=torch.float16,
+                                             enabled=device == 'cuda'):
+            traced = torch.jit.trace(model, example)
+        return torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+    except Exception as e:
+        print(f"Warning: Could not compile FaceNet, using eager model: {e}")
+        return model
+
+
+def warm_up_model(model):
+    """
+    Run dummy batches so one-off setup happens before the video loop
+
+    Args:
+        model: FaceNet model as returned by compile_model
+    """
+    # cuDNN algorithm search, allocator growth and TorchScript's profiling runs
+    # would otherwise stall the first recognized face
+    with torch.inference_mode(), torch.autocast(device_type=device, dtype=torch.float16,
+                                                 enabled=device == 'cuda'):
+        for batch_size in (1, MAX_BATCH):
+            for _ in range(2):
+                model(torch.zeros(batch_size, 3, 160, 160, device=device))
+    if device == 'cuda':
+        torch.cuda.synchronize()
+
+
+crop_buffer = np.empty((MAX_BATCH, 160, 160, 3), dtype=np.uint8)  # reused face crops
+
+
+def allocate_input_buffers(size):
+    """
+    Allocate the reused model input: a NumPy view, plus pinned host and device tensors on CUDA
+
+    Args:
+        size (int): Number of faces the buffers hold
+
+    Returns:
+        tuple: (numpy.ndarray, pinned torch.Tensor or None, device torch.Tensor or None)
+    """
+    if device != 'cuda':
+        return np.empty((size, 3, 160, 160), dtype=np.float32), None, None
+    host = torch.empty((size, 3, 160, 160), dtype=torch.float32).pin_memory()
+    return host.numpy(), host, torch.empty_like(host, device=device)
+
+
+input_buffer, host_buffer, device_buffer = allocate_input_buffers(MAX_BATCH)
+inference_stream = torch.cuda.Stream() if device == 'cuda' else None
+facenet_model = compile_model(InceptionResnetV1(pretrained='casia-webface').eval().to(device))
+warm_up_model(facenet_model)
+
+
+def get_embeddings(batch):
+    """
+    Generate face embeddings for a batch of faces using FaceNet model
+
+    Args:
+        batch (numpy.ndarray): Input face images stacked as (N, 160, 160, 3)
+
+    Returns:
+        numpy.ndarray: (N, 512) face embedding vectors
+    """
+    return run_facenet(batch).float().cpu().numpy()
+
+
+def run_facenet(batch):
+    """
+    Standardize a batch of faces and run it through FaceNet, leaving the output on the device
+
+    Args:
+        batch (numpy.ndarray): Input face images stacked as (N, 160, 160, 3)
+
+    Returns:
+        torch.Tensor: (N, 512) face embeddings on the model's device
+    """
+    global input_buffer, host_buffer, device_buffer
+    if len(batch) > len(input_buffer):
+        input_buffer, host_buffer, device_buffer = allocate_input_buffers(len(batch))
+    # Convert straight into the reused NCHW buffer, then standardize each face in place
+    samples = input_buffer[:len(batch)]
+    np.copyto(samples, batch.transpose(0, 3, 1, 2))
+    flat = samples.reshape(len(batch), -1)
+    flat -= flat.mean(axis=1, keepdims=True)
+    flat /= flat.std(axis=1, keepdims=True)
+    if device != 'cuda':
+        with torch.inference_mode():
+            return facenet_model(torch.from_numpy(samples))
+
+    # Async copy out of the pinned staging buffer and FP16 inference on a dedicated stream
+    with torch.cuda.stream(inference_stream):
+        samples = device_buffer[:len(batch)]
+        samples.copy_(host_buffer[:len(batch)], non_blocking=True)
+        with torch.inference_mode(), torch.autocast(device_type=device, dtype=torch.float16):
+            yhat = facenet_model(samples)
+    # Single sync point: later work on the default stream waits for the result
+    torch.cuda.current_stream().wait_stream(inference_stream)
+    return yhat
+
+
+def recognize_faces(frame, faces, track_ids):
+    """
+    Match every detected face in a frame with one FaceNet forward pass
+
+    Args:
+        frame (numpy.ndarray): BGR camera frame
+        faces: Face boxes (x, y, w, h) from the detector
+        track_ids: Track id of each box; cached matches are only reused within a track
+
+    Returns:
+        tuple: Best matching label and its similarity for each face
+    """
+    if len(faces) == 0:
+        return [], []
+    global crop_buffer
+    if len(faces) > len(crop_buffer):
+        crop_buffer = np.empty((len(faces), 160, 160, 3), dtype=np.uint8)
+    # Resize every face straight into the reused crop buffer
+    crops = crop_buffer[:len(faces)]
+    for crop, (x, y, w, h) in zip(crops, faces):
+        cv2.resize(frame[y:y + h, x:x + w, :], (160, 160), dst=crop)
+    # A coarse hash alone can collide between two people; scope it to the track
+    keys = [(track_id, crop_hash(crop)) for track_id, crop in zip(track_ids, crops)]
+    now = time.monotonic()
+    results = [None] * len(crops)
+    for i, key in enumerate(keys):
+        cached = match_cache.get(key)
+        if cached is not None and now - cached[2] < MATCH_CACHE_TTL:
+            results[i] = cached[:2]
+
+    # Only crops that changed since a recent keyframe go through FaceNet
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        batch = crops if len(misses) == len(crops) else crops[misses]
+        if EMBEDDINGS_GPU is not None:
+            matches = best_matches_on_device(batch)
+        else:
+            embeddings = get_embeddings(batch)
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+            matches = best_matches(embeddings)
+        for i, label, score in zip(misses, *matches):
+            results[i] = (label, score)
+            match_cache[keys[i]] = (label, score, now)
+            match_cache.move_to_end(keys[i])
+        while len(match_cache) > MATCH_CACHE_SIZE:
+            match_cache.popitem(last=False)
+    labels, scores = zip(*results)
+    return list(labels), list(scores)
+
+
+def crop_hash(crop):
+    """Average hash of a face crop: 64 bits that stay the same while the face barely moves"""
+    small = cv2.resize(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), (8, 8), interpolation=cv2.INTER_AREA)
+    return np.packbits(small > small.mean()).tobytes()
+
+
+match_cache = OrderedDict()  # (track id, crop hash) -> (label, score, time matched)
+
+
+def box_iou(a, b):
+    """
+    Intersection over union of two (x, y, w, h) boxes
 
+    Args:
+        a, b: Boxes as (x, y, w, h)
 
-facenet_model = InceptionResnetV1(pretrained='casia-webface').eval()
+    Returns:
+        float: Overlap ratio between 0 and 1
+    """
+    iw = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    ih = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / (a[2] * a[3] + b[2] * b[3] - inter)
 
 
-def get_embedding(face_pixels):
+def assign_track_ids(faces, tracks):
     """
-    Generate face embedding using FaceNet model
+    Carry track ids over from the previous keyframe to the boxes that overlap them
 
     Args:
-        face_pixels (numpy.ndarray): Input face image
+        faces: Face boxes (x, y, w, h) from the detector
+        tracks: Tracks of the previous keyframe, [tracker, box, label, score, track id]
 
     Returns:
-        numpy.ndarray: Face embedding vector
+        list: Track id per box; boxes with no matching track get a new id
     """
-    if face_pixels.shape[:2] != (160, 160):
-        face_pixels = cv2.resize(face_pixels, (160, 160))
+    free = {track[4]: track[1] for track in tracks}
+    track_ids = []
+    for box in faces:
+        best = max(free, key=lambda track_id: box_iou(box, free[track_id]), default=None)
+        if best is not None and box_iou(box, free[best]) >= TRACK_IOU:
+            track_ids.append(best)
+            del free[best]  # one box per track
+        else:
+            track_ids.append(next(track_counter))
+    return track_ids
+
+
+track_counter = itertools.count()
 
-    face_pixels = face_pixels.astype('float32')
-    mean, std = face_pixels.mean(), face_pixels.std()
-    face_pixels = (face_pixels - mean) / std
-    samples = np.expand_dims(face_pixels, axis=0)
-    samples = torch.tensor(samples).permute(0, 3, 1, 2)
-    with torch.no_grad():
-        yhat = facenet_model(samples)
-    return yhat[0].numpy()
+
+def best_matches_on_device(batch):
+    """
+    Embed and match a batch of faces without copying the embeddings off the GPU
+
+    Args:
+        batch (numpy.ndarray): Input face images stacked as (N, 160, 160, 3)
+
+    Returns:
+        tuple: Best matching label and its similarity for each face
+    """
+    with torch.inference_mode():
+        queries = F.normalize(run_facenet(batch).float(), dim=1).half()
+        # FP16 GEMM against the resident roster; only indices and scores come back
+        scores, idx = (queries @ EMBEDDINGS_GPU.T).max(dim=1)
+    return LABELS[idx.cpu().numpy()], scores.float().cpu().numpy()
+
+
+def best_matches(embeddings):
+    """
+    Find the closest stored int8 embedding for each query, a tile of MATCH_TILE rows at a time
+
+    Args:
+        embeddings (numpy.ndarray): (K, 512) unit-length query embeddings
+
+    Returns:
+        tuple: Best matching label and its similarity for each query
+    """
+    # Quantize the queries with the roster's scale; accumulate in int32 so products can't overflow
+    queries = np.clip(np.round(embeddings / EMBEDDING_SCALE), -127, 127).astype(np.int32)
+    rows = np.arange(len(embeddings))
+    best_idx = np.zeros(len(embeddings), dtype=np.intp)
+    best_score = np.full(len(embeddings), -np.inf, dtype=np.float32)
+    for start in range(0, len(EMBEDDINGS), MATCH_TILE):
+        # Rows are unit length, so a matrix product gives the cosine similarities
+        tile = EMBEDDINGS[start:start + MATCH_TILE].astype(np.int32)
+        similarities = (queries @ tile.T).astype(np.float32) * (EMBEDDING_SCALE * EMBEDDING_SCALE)
+        idx = similarities.argmax(axis=1)
+        score = similarities[rows, idx]
+        better = score > best_score
+        best_idx[better] = idx[better] + start
+        best_score[better] = score[better]
+        # Stop scanning once every face already has an accepted match
+        if (best_score > MATCH_THRESHOLD).all():
+            break
+    return LABELS[best_idx], best_score
+
+
+def create_tracker():
+    """
+    Create a KCF box tracker
+
+    Returns:
+        cv2 tracker, or None when opencv-contrib is not installed (boxes are then held)
+    """
+    for module in (cv2, getattr(cv2, 'legacy', None)):
+        factory = getattr(module, 'TrackerKCF_create', None)
+        if factory is not None:
+            return factory()
+    return None
 
 
 print("Initializing camera...")
-video = cv2.VideoCapture(0)
+video = open_camera()
 
 # Check if camera is opened successfully
 if not video.isOpened():
@@ -53,12 +347,7 @@ if not video.isOpened():
     print("4. Try using a different camera index (0, 1, 2, etc.)")
     exit(1)
 
-# Set camera properties for better compatibility
-video.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-video.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-video.set(cv2.CAP_PROP_FPS, 30)
-
-facedetect = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
+facedetect = get_cascade()
 
 # Check if face cascade is loaded
 if facedetect.empty():
@@ -69,20 +358,42 @@ if facedetect.empty():
 
 conn = sqlite3.connect('data/attendance.db')
 cursor = conn.cursor()
-cursor.execute("SELECT name, face_data FROM faces")
+
+# Embeddings are cached beside each face sample; only samples without one are embedded
+if 'embedding' not in [column[1] for column in cursor.execute("PRAGMA table_info(faces)")]:
+    cursor.execute("ALTER TABLE faces ADD COLUMN embedding BLOB")
+
+cursor.execute("SELECT id, face_data FROM faces WHERE embedding IS NULL")
+pending = cursor.fetchall()
+if pending:
+    print(f"Computing embeddings for {len(pending)} new face samples...")
+    for start in range(0, len(pending), MAX_BATCH):
+        chunk = pending[start:start + MAX_BATCH]
+        # Upscale the stored faces into one buffer, then embed them in a single forward pass
+        face_batch = np.empty((len(chunk), 160, 160, 3), dtype=np.uint8)
+        for i, face_np in enumerate(decode_bgr_samples([face_data for _, face_data in chunk])):
+            cv2.resize(face_np, (160, 160), dst=face_batch[i])
+        embeddings = get_embeddings(face_batch).astype(np.float32)
+        cursor.executemany("UPDATE faces SET embedding = ? WHERE id = ?",
+                           [(embedding.tobytes(), row_id) for embedding, (row_id, _) in zip(embeddings, chunk)])
+    conn.commit()
+
+cursor.execute("SELECT name, embedding FROM faces")
 data = cursor.fetchall()
 
-LABELS = []
-EMBEDDINGS = []
-for row in data:
-    name, face_data = row
-    face_np = np.frombuffer(face_data, dtype=np.uint8).reshape(50, 50, 3)
-    embedding = get_embedding(face_np)
-    LABELS.append(name)
-    EMBEDDINGS.append(embedding)
+if not data:
+    print("Error: No registered students found. Please register students first.")
+    video.release()
+    exit(1)
 
-LABELS = np.array(LABELS)
-EMBEDDINGS = np.array(EMBEDDINGS)
+LABELS = np.array([name for name, _ in data])
+EMBEDDINGS = np.stack([np.frombuffer(embedding, dtype=np.float32) for _, embedding in data])
+EMBEDDINGS /= np.linalg.norm(EMBEDDINGS, axis=1, keepdims=True)  # normalized once, not per match
+# On a GPU the roster stays resident in FP16 and matching happens there
+EMBEDDINGS_GPU = torch.from_numpy(EMBEDDINGS).to(device).half() if device == 'cuda' else None
+# Unit-length rows share a small range, so one scale quantizes them all to int8
+EMBEDDING_SCALE = np.abs(EMBEDDINGS).max() / 127
+EMBEDDINGS = np.round(EMBEDDINGS / EMBEDDING_SCALE).astype(np.int8)
 
 print(f"Loaded {len(LABELS)} registered students: {', '.join(LABELS)}")
 print("Starting attendance system...")
@@ -93,7 +404,6 @@ csv_file = "Attendance/Attendance_.csv"
 late_attendance_file = "Attendance/late_attendance_record.csv"
 
 # Create attendance directory if it doesn't exist
-import os
 os.makedirs("Attendance", exist_ok=True)
 
 # Initialize CSV files if they don't exist
@@ -110,26 +420,48 @@ yesterday_date = (datetime.now() - timedelta(1)).strftime("%d-%m-%Y")
 current_date = datetime.now().strftime("%d-%m-%Y")
 
 absentees_marked = False
+frame_idx = 0
+tracks = []  # [tracker, box, label, score, track id] per face found on the last keyframe
 
-while True:
-    ret, frame = video.read()
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = facedetect.detectMultiScale(gray, 1.3, 5)
-
-    current_time = datetime.now().strftime("%H:%M:%S")
-    current_time_obj = datetime.strptime(current_time, "%H:%M:%S")
-    cutoff_time = datetime.strptime("09:00:00", "%H:%M:%S")
-
-    for (x, y, w, h) in faces:
-        crop_img = frame[y:y + h, x:x + w, :]
-        resized_img = cv2.resize(crop_img, (160, 160))
-        embedding = get_embedding(resized_img)
-
-        similarities = cosine_similarity([embedding], EMBEDDINGS)
-        best_match_idx = np.argmax(similarities)
-        output = LABELS[best_match_idx]
+# Camera reads overlap with detection/recognition instead of blocking the loop
+grabber = FrameGrabber(video)
 
-        if similarities[0][best_match_idx] > 0.7:
+while True:
+    ret, frame = grabber.read()
+    if not ret:
+        continue
+
+    if frame_idx % KEYFRAME_INTERVAL == 0:
+        # Colour conversion, resize and detection run through the T-API (OpenCL when available)
+        gray = cv2.cvtColor(cv2.UMat(frame), cv2.COLOR_BGR2GRAY)
+        # Detect on a half-size frame (4x fewer pixels); embeddings still use full-res crops
+        small = cv2.resize(gray, (0, 0), fx=1 / DETECTION_SCALE, fy=1 / DETECTION_SCALE,
+                           interpolation=cv2.INTER_AREA)
+        faces_small = facedetect.detectMultiScale(small, 1.2, 5, minSize=(30, 30))
+        faces = [tuple(int(v) * DETECTION_SCALE for v in box) for box in faces_small]
+
+        # Fresh trackers for whatever this keyframe found; ids continue where boxes overlap
+        track_ids = assign_track_ids(faces, tracks)
+        tracks = []
+        for box, track_id, label, score in zip(faces, track_ids, *recognize_faces(frame, faces, track_ids)):
+            tracker = create_tracker()
+            if tracker is not None:
+                tracker.init(frame, box)
+            tracks.append([tracker, box, label, score, track_id])
+    else:
+        # In between keyframes only move the boxes; labels carry over
+        for track in tracks:
+            if track[0] is not None:
+                ok, box = track[0].update(frame)
+                if ok:
+                    track[1] = tuple(int(v) for v in box)
+    frame_idx += 1
+
+    now = datetime.now()
+    current_time = now.strftime("%H:%M:%S")
+
+    for _, (x, y, w, h), output, score, _ in tracks:
+        if score > MATCH_THRESHOLD:
             cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 1)
             cv2.rectangle(frame, (x, y), (x + w, y + h), (50, 50, 255), 2)
             cv2.rectangle(frame, (x, y - 60), (x + w, y), (50, 50, 255), -1)
@@ -146,11 +478,12 @@ while True:
     k = cv2.waitKey(5)
     if k == ord('o'):
         reason = ""
-        late_duration = current_time_obj - cutoff_time
+        late_duration = now - datetime.combine(now.date(), CUTOFF_TIME)
+        on_time = now.time() <= LATE_CUTOFF_TIME
         marked_attendance = False
 
         # Determine attendance status
-        if current_time <= "9:05:00":
+        if on_time:
             present = 1
             speak("Attendance Taken..")
             marked_attendance = True
@@ -159,21 +492,14 @@ while True:
             speak("You're late. So you were marked as present but must provide a reason for being late.")
             reason = input("Please type the reason for being late: ")
 
-        for (x, y, w, h) in faces:
-            crop_img = frame[y:y + h, x:x + w, :]
-            resized_img = cv2.resize(crop_img, (160, 160))
-            embedding = get_embedding(resized_img)
-
-            similarities = cosine_similarity([embedding], EMBEDDINGS)
-            best_match_idx = np.argmax(similarities)
-            output = LABELS[best_match_idx]
-
-            if similarities[0][best_match_idx] > 0.7:
+        # Reuse the labels from the last keyframe instead of detecting and embedding again
+        for _, _, output, score, _ in tracks:
+            if score > MATCH_THRESHOLD:
                 if current_date in attendance_df.columns:
                     attendance_df.loc[attendance_df['names'] == output, current_date] = present
                     marked_attendance = True
 
-                    if current_time > "9:05:00":
+                    if not on_time:
                         late_attendance_df[current_date] = late_attendance_df[current_date].astype('object')
                         late_attendance_df.loc[
                             late_attendance_df['name'] == output, current_date] = f"{reason} ({current_time})"
@@ -188,10 +514,8 @@ while True:
         if not marked_attendance:
             print("No attendance marked due to time constraints or multiple people after 9:05 AM.")
 
-        if not absentees_marked:
-            for index, row in attendance_df.iterrows():
-                if pd.isna(row[yesterday_date]):
-                    attendance_df.at[index, yesterday_date] = 0
+        if not absentees_marked and yesterday_date in attendance_df.columns:
+            attendance_df[yesterday_date] = attendance_df[yesterday_date].fillna(0)
             absentees_marked = True
 
         attendance_df.to_csv(csv_file, index=False)
@@ -200,6 +524,7 @@ while True:
         break
 
 # Clean up resources
+grabber.stop()
 video.release()
 cv2.destroyAllWindows()
 conn.close()
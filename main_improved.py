@@ -5,48 +5,59 @@ Improved Smart Face Attendance System with better face recognition
 import cv2
 import sqlite3
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
 import os
 import sys
+import pickle
+import atexit
+from camera_utils import open_camera
+from attendance_log import AttendanceLog
+from face_samples import decode_gray_samples
+from face_utils import USE_OPENCL, get_cascade
+
+DB_PATH = 'data/attendance.db'
+MODEL_PATH = 'data/lbph.yml'
+LABELS_PATH = 'data/lbph_labels.pkl'
+PID_FILE = 'run/attendance.pid'  # written by the web dashboard when it starts us
+DETECTION_SCALE = 2  # Haar detection runs on the frame downscaled by this factor
+
+def database_mtime():
+    """Last modification time of the face database, including its WAL file"""
+    paths = (DB_PATH, DB_PATH + '-wal')
+    return max(os.path.getmtime(path) for path in paths if os.path.exists(path))
+
+def load_cached_model(face_recognizer):
+    """Load the saved LBPH model if it is newer than the database, else return None"""
+    try:
+        if os.path.getmtime(MODEL_PATH) <= database_mtime():
+            return None
+        with open(LABELS_PATH, 'rb') as f:
+            label_names = pickle.load(f)
+        face_recognizer.read(MODEL_PATH)
+        return label_names
+    except Exception:
+        return None
+
+def save_model(face_recognizer, label_names):
+    """Persist the trained LBPH model and its label mapping"""
+    try:
+        # Labels first: the model file's mtime marks the cache as complete
+        with open(LABELS_PATH, 'wb') as f:
+            pickle.dump(label_names, f)
+        face_recognizer.write(MODEL_PATH)
+    except Exception as e:
+        print(f"⚠️ Could not cache trained model: {e}")
 
 def initialize_system():
     """Initialize camera, face detection, and database"""
     print("🚀 Initializing Smart Face Attendance System...")
     
-    # Initialize camera with Mac-specific optimizations
-    import platform
-    
-    cap = None
-    if platform.system() == "Darwin":  # macOS
-        print("🍎 Detected macOS - Using AVFoundation backend for built-in camera")
-        # Use AVFoundation backend for better Mac compatibility
-        cap = cv2.VideoCapture(0, cv2.CAP_AVFOUNDATION)
-        if cap.isOpened():
-            # Test if we can read from this camera
-            ret, _ = cap.read()
-            if not ret:
-                print("⚠️  Built-in camera not responding, trying default backend...")
-                cap.release()
-                cap = None
-    
-    # Fallback to default backend if AVFoundation fails
-    if cap is None:
-        cap = cv2.VideoCapture(0)
-    
+    # Initialize camera (AVFoundation on macOS, V4L2 on Linux; 640x480, 1-frame buffer)
+    cap = open_camera()
     if not cap.isOpened():
         print("❌ Error: Cannot open camera")
         return None, None, None, None
     
-    # Set camera properties for stability
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    cap.set(cv2.CAP_PROP_FPS, 30)
-    
-    # For macOS, set MJPEG codec for better performance
-    if platform.system() == "Darwin":
-        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
-    
     # Test camera
     ret, test_frame = cap.read()
     if not ret:
@@ -58,7 +69,8 @@ def initialize_system():
     
     
     # Load face detector
-    face_cascade = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
+    cv2.ocl.setUseOpenCL(USE_OPENCL)
+    face_cascade = get_cascade()
     if face_cascade.empty():
         print("❌ Error: Cannot load face cascade classifier")
         cap.release()
@@ -68,13 +80,23 @@ def initialize_system():
     # Initialize face recognizer (using LBPH - Local Binary Pattern Histogram)
     face_recognizer = cv2.face.LBPHFaceRecognizer_create()
     
+    # Reuse the saved model when no student was registered since it was trained
+    label_names = load_cached_model(face_recognizer)
+    if label_names:
+        print(f"⚡ Loaded cached model for {len(label_names)} students")
+        return cap, face_cascade, face_recognizer, label_names
+    
     # Connect to database and load training data
     try:
-        conn = sqlite3.connect('data/attendance.db')
+        conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
         # Check if we have trained data
-        cursor.execute("SELECT name, face_data FROM faces")
+        # Rows arrive grouped by name (via the index) with their per-student label already assigned
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_faces_name ON faces(name)")
+        conn.commit()
+        cursor.execute("""SELECT name, face_data, DENSE_RANK() OVER (ORDER BY name) - 1
+                          FROM faces ORDER BY name""")
         data = cursor.fetchall()
         
         if not data:
@@ -84,36 +106,20 @@ def initialize_system():
             conn.close()
             return None, None, None, None
         
-        # Group faces by student name
-        student_faces = {}
-        for name, face_data in data:
-            if name not in student_faces:
-                student_faces[name] = []
-            
-            # Convert blob back to image
-            face_np = np.frombuffer(face_data, dtype=np.uint8).reshape(50, 50, 3)
-            # Convert to grayscale for recognition
-            face_gray = cv2.cvtColor(face_np, cv2.COLOR_BGR2GRAY)
-            student_faces[name].append(face_gray)
+        # Decode every sample into one contiguous grayscale array
+        faces = decode_gray_samples([face_data for _, face_data, _ in data])
+        labels = np.array([label for _, _, label in data], dtype=np.int32)
         
-        # Prepare training data
-        faces = []
-        labels = []
-        label_names = {}
-        
-        label_id = 0
-        for name, face_list in student_faces.items():
-            label_names[label_id] = name
-            for face in face_list:
-                faces.append(face)
-                labels.append(label_id)
-            print(f"📚 Loaded {len(face_list)} samples for {name}")
-            label_id += 1
+        label_names = {label: name for name, _, label in data}
+        sample_counts = np.bincount(labels, minlength=len(label_names))
+        for label, name in label_names.items():
+            print(f"📚 Loaded {sample_counts[label]} samples for {name}")
         
         # Train the recognizer
-        if faces:
-            face_recognizer.train(faces, np.array(labels))
-            print(f"🎯 Training completed with {len(faces)} samples from {len(student_faces)} students")
+        if len(faces):
+            face_recognizer.train(list(faces), labels)
+            print(f"🎯 Training completed with {len(faces)} samples from {len(label_names)} students")
+            save_model(face_recognizer, label_names)
         else:
             print("❌ No valid face data found")
             cap.release()
@@ -128,75 +134,28 @@ def initialize_system():
         cap.release()
         return None, None, None, None
 
-def mark_attendance(name, csv_file, late_file):
-    """Mark attendance for a student"""
-    current_time = datetime.now()
-    current_date = current_time.strftime("%d-%m-%Y")
-    current_time_str = current_time.strftime("%H:%M:%S")
-    
-    # Create directories if they don't exist
-    os.makedirs("Attendance", exist_ok=True)
-    
-    # Check if CSV file exists and has correct format
-    try:
-        df = pd.read_csv(csv_file)
-        expected_columns = ["Name", "Time", "Date"]
-        if not all(col in df.columns for col in expected_columns):
-            print(f"📝 Updating CSV format for {csv_file}")
-            df = pd.DataFrame(columns=expected_columns)
-            df.to_csv(csv_file, index=False)
-        
-        # Check if already marked today
-        if not df.empty:
-            today_attendance = df[(df['Date'] == current_date) & (df['Name'] == name)]
-            if not today_attendance.empty:
-                return f"⏰ {name} already marked present today"
-                
-    except FileNotFoundError:
-        # Create empty DataFrame with correct columns
-        df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        df.to_csv(csv_file, index=False)
-    except Exception as e:
-        print(f"⚠️ Error with CSV file: {e}")
-        df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        df.to_csv(csv_file, index=False)
-    
-    # Mark attendance
-    new_entry = pd.DataFrame({
-        "Name": [name],
-        "Time": [current_time_str], 
-        "Date": [current_date]
-    })
-    
-    # Read the current file again to ensure we have the latest data
+def release_pid_file():
+    """Remove the dashboard's PID lockfile if it points at this process"""
     try:
-        df = pd.read_csv(csv_file)
-    except:
-        df = pd.DataFrame(columns=["Name", "Time", "Date"])
-    
-    df = pd.concat([df, new_entry], ignore_index=True)
-    df.to_csv(csv_file, index=False)
-    
-    # Check if late (after 9 AM)
-    is_late = current_time.hour >= 9
+        with open(PID_FILE) as f:
+            if int(f.read().strip()) == os.getpid():
+                os.remove(PID_FILE)
+    except (OSError, ValueError):
+        pass
+
+def mark_attendance(name, attendance_log):
+    """Mark attendance for a student"""
+    newly_marked, is_late, current_time_str = attendance_log.mark(name)
     
+    if not newly_marked:
+        return f"⏰ {name} already marked present today"
     if is_late:
-        try:
-            late_df = pd.read_csv(late_file)
-            if not all(col in late_df.columns for col in ["Name", "Time", "Date"]):
-                late_df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        except FileNotFoundError:
-            late_df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        except Exception:
-            late_df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        
-        late_df = pd.concat([late_df, new_entry], ignore_index=True)
-        late_df.to_csv(late_file, index=False)
         return f"🔴 {name} marked present (LATE) at {current_time_str}"
-    else:
-        return f"✅ {name} marked present (ON TIME) at {current_time_str}"
+    return f"✅ {name} marked present (ON TIME) at {current_time_str}"
 
 def main():
+    atexit.register(release_pid_file)
+    
     # Initialize system
     cap, face_cascade, face_recognizer, label_names = initialize_system()
     
@@ -204,9 +163,8 @@ def main():
         print("❌ System initialization failed!")
         return
     
-    # Set up CSV files
-    csv_file = "Attendance/Attendance_.csv"
-    late_file = "Attendance/late_attendance_record.csv"
+    # Set up CSV files (kept open for appending; already-marked names held in memory)
+    attendance_log = AttendanceLog()
     
     print("🎯 System ready! Students can now approach the camera for attendance.")
     print("🔧 Recognition settings:")
@@ -222,6 +180,9 @@ def main():
     last_recognition_time = {}  # To avoid multiple recognitions of same person
     recognition_cooldown = 10  # seconds
     frame_count = 0
+    gray = small_gray = None
+    face_roi_resized = np.empty((50, 50), dtype=np.uint8)  # reused for every face
+    adaptive_threshold = base_confidence_threshold  # shown in the overlay before any face is seen
     
     try:
         while True:
@@ -233,21 +194,29 @@ def main():
             
             frame_count += 1
             
-            # Convert to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            # (Re)allocate the grayscale buffers only when the frame size changes
+            if gray is None or gray.shape != frame.shape[:2]:
+                gray = np.empty(frame.shape[:2], dtype=np.uint8)
+                small_gray = np.empty((frame.shape[0] // DETECTION_SCALE,
+                                       frame.shape[1] // DETECTION_SCALE), dtype=np.uint8)
             
-            # Enhance image for better detection
-            gray = cv2.equalizeHist(gray)
+            # Convert to grayscale and enhance image for better detection
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+            cv2.equalizeHist(gray, dst=gray)
             
-            # Detect faces with multiple scales
-            faces = face_cascade.detectMultiScale(
-                gray, 
+            # Detect on the downscaled frame (4x fewer pixels for Haar to scan)
+            cv2.resize(gray, (small_gray.shape[1], small_gray.shape[0]), dst=small_gray,
+                       interpolation=cv2.INTER_AREA)
+            small_faces = face_cascade.detectMultiScale(
+                cv2.UMat(small_gray) if USE_OPENCL else small_gray, 
                 scaleFactor=1.1, 
                 minNeighbors=5, 
-                minSize=(60, 60),
-                maxSize=(300, 300),
+                minSize=(60 // DETECTION_SCALE, 60 // DETECTION_SCALE),
+                maxSize=(300 // DETECTION_SCALE, 300 // DETECTION_SCALE),
                 flags=cv2.CASCADE_SCALE_IMAGE
             )
+            # Scale boxes back to full resolution for recognition and drawing
+            faces = [tuple(int(v) * DETECTION_SCALE for v in box) for box in small_faces]
             
             current_time = datetime.now()
             
@@ -265,7 +234,7 @@ def main():
                     continue
                 
                 # Resize to match training data
-                face_roi_resized = cv2.resize(face_roi, (50, 50))
+                cv2.resize(face_roi, (50, 50), dst=face_roi_resized)
                 
                 # Recognize face
                 label, confidence = face_recognizer.predict(face_roi_resized)
@@ -300,7 +269,7 @@ def main():
                     if name not in last_recognition_time or \
                        (current_time - last_recognition_time[name]).seconds > recognition_cooldown:
                         
-                        result = mark_attendance(name, csv_file, late_file)
+                        result = mark_attendance(name, attendance_log)
                         print(result)
                         last_recognition_time[name] = current_time
                         
@@ -336,6 +305,7 @@ def main():
         # Cleanup
         cap.release()
         cv2.destroyAllWindows()
+        attendance_log.close()
         print("🔒 System shutdown complete")
 
 if __name__ == "__main__":
@@ -1,56 +1,123 @@
 #!/usr/bin/env python3
 """
-Simplified Smart Face Attendance System using OpenCV's built-in face recognition
+Simplified Smart Face Attendance System matching faces against the stored samples
 """
 import cv2
 import sqlite3
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
 import pyttsx3
 import os
+import queue
+import signal
+import threading
 import sys
+from attendance_log import AttendanceLog
+from camera_utils import FrameGrabber, enable_raw_yuyv, open_camera, split_yuyv
+from face_samples import SAMPLE_SIZE, crop_sample, decode_gray_samples
+from face_utils import USE_OPENCL, get_cascade
 
-def speak(text):
-    """Text to speech function"""
+try:
+    import faiss  # optional: SIMD-tuned search for large rosters
+except ImportError:
+    faiss = None
+
+def tts_worker():
+    """Speak queued messages on one long-lived engine, off the video loop"""
     try:
         engine = pyttsx3.init()
-        engine.say(text)
-        engine.runAndWait()
     except Exception as e:
         print(f"Speech error: {e}")
+        return
+    for text in iter(tts_queue.get, None):
+        try:
+            engine.say(text)
+            engine.runAndWait()
+        except Exception as e:
+            print(f"Speech error: {e}")
+
+tts_queue = queue.Queue()
+
+def speak(text):
+    """Text to speech function (queued; returns immediately)"""
+    tts_queue.put_nowait(text)
+
+DETECT_INTERVAL = 7  # run the Haar cascade every Nth frame; trackers follow faces in between
+DETECTION_SCALE = 2  # cascade runs on the frame downscaled by this factor
+MATCH_THRESHOLD = 0.85  # correlation with a stored sample needed to accept a match
+FAISS_MIN_SAMPLES = 200  # below this a NumPy matrix-vector product is just as fast
+HEADLESS = bool(int(os.environ.get("FACE_HEADLESS", "0")))  # no window: run as a kiosk/service
+
+def face_vectors(faces):
+    """Flatten (N, 50, 50) grayscale faces into zero-mean, unit-length float32 rows"""
+    vectors = faces.reshape(len(faces), -1).astype(np.float32)
+    vectors -= vectors.mean(axis=1, keepdims=True)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-6
+    return vectors
+
+class Recognizer:
+    """Finds the stored sample closest to a face vector, through faiss for large rosters"""
+    
+    def __init__(self, vectors, labels):
+        self.labels = labels
+        self.index = None
+        if faiss is not None and len(vectors) >= FAISS_MIN_SAMPLES:
+            self.index = faiss.IndexFlatIP(vectors.shape[1])
+            self.index.add(vectors)
+            return
+        # Small roster (or no faiss): float32 rows, matched with one BLAS matrix product
+        self.vectors = vectors
+    
+    def match(self, vectors):
+        """Return the labels and scores of the best matching sample for each row of vectors"""
+        if self.index is not None:
+            scores, idx = self.index.search(vectors, 1)
+            return self.labels[idx[:, 0]], scores[:, 0]
+        scores = vectors @ self.vectors.T
+        best = scores.argmax(axis=1)
+        return self.labels[best], scores[np.arange(len(vectors)), best]
+
+def create_tracker():
+    """Create a KCF tracker, or return None when opencv-contrib is not installed"""
+    for module in (cv2, getattr(cv2, 'legacy', None)):
+        factory = getattr(module, 'TrackerKCF_create', None)
+        if factory is not None:
+            return factory()
+    return None
 
 def initialize_system():
     """Initialize camera, face detection, and database"""
     print("Initializing Smart Face Attendance System...")
     
+    # Parallel Haar cascade: use all but one core for OpenCV's worker threads
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(max(1, (os.cpu_count() or 1) - 1))
+    cv2.ocl.setUseOpenCL(USE_OPENCL)
+    
     # Initialize camera
-    cap = cv2.VideoCapture(0)
+    cap = open_camera()
     if not cap.isOpened():
         print("Error: Cannot open camera")
         return None, None, None, None
     
-    # Set camera properties
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    
     # Load face detector
-    face_cascade = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
+    face_cascade = get_cascade()
     if face_cascade.empty():
         print("Error: Cannot load face cascade classifier")
         cap.release()
         return None, None, None, None
     
-    # Initialize face recognizer (using LBPH - Local Binary Pattern Histogram)
-    face_recognizer = cv2.face.LBPHFaceRecognizer_create()
-    
     # Connect to database
     try:
         conn = sqlite3.connect('data/attendance.db')
         cursor = conn.cursor()
         
         # Check if we have trained data
-        cursor.execute("SELECT name, face_data FROM faces")
+        # Rows arrive grouped by name (via the index) with their per-student label already assigned
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_faces_name ON faces(name)")
+        conn.commit()
+        cursor.execute("""SELECT name, face_data, DENSE_RANK() OVER (ORDER BY name) - 1
+                          FROM faces ORDER BY name""")
         data = cursor.fetchall()
         
         if not data:
@@ -59,189 +126,127 @@ def initialize_system():
             conn.close()
             return None, None, None, None
         
-        # Prepare training data
-        faces = []
-        labels = []
-        label_names = {}
-        label_id = 0
+        # Decode every blob in one pass into (N, 50, 50) grayscale
+        faces = decode_gray_samples([face_data for _, face_data, _ in data])
         
-        for row in data:
-            name, face_data = row
-            # Convert blob back to image
-            face_np = np.frombuffer(face_data, dtype=np.uint8).reshape(50, 50, 3)
-            # Convert to grayscale for recognition
-            face_gray = cv2.cvtColor(face_np, cv2.COLOR_BGR2GRAY)
-            
-            faces.append(face_gray)
-            labels.append(label_id)
-            label_names[label_id] = name
-            label_id += 1
+        # One label per student, not per sample
+        labels = np.array([label for _, _, label in data], dtype=np.int32)
+        label_names = {label: name for name, _, label in data}
         
-        # Train the recognizer
-        face_recognizer.train(faces, np.array(labels))
-        print(f"Trained with {len(data)} face samples from {len(set([row[0] for row in data]))} students")
+        # Every sample becomes one row of a matrix; matching is then a single matrix-vector product
+        recognizer = Recognizer(face_vectors(faces), labels)
+        print(f"Loaded {len(data)} face samples from {len(label_names)} students")
         
         conn.close()
-        return cap, face_cascade, face_recognizer, label_names
+        return cap, face_cascade, recognizer, label_names
         
     except Exception as e:
         print(f"Database error: {e}")
         cap.release()
         return None, None, None, None
 
-def mark_attendance(name, csv_file, late_file):
+def mark_attendance(name, attendance_log):
     """Mark attendance for a student"""
-    current_time = datetime.now()
-    current_date = current_time.strftime("%d-%m-%Y")
-    current_time_str = current_time.strftime("%H:%M:%S")
-    
-    # Create directories and files if they don't exist
-    os.makedirs("Attendance", exist_ok=True)
-    
-    # Check if CSV file exists and has correct format
-    try:
-        df = pd.read_csv(csv_file)
-        
-        # Check if the CSV has the correct columns
-        expected_columns = ["Name", "Time", "Date"]
-        if not all(col in df.columns for col in expected_columns):
-            print(f"Old CSV format detected. Creating new format...")
-            # Create new DataFrame with correct structure
-            df = pd.DataFrame(columns=expected_columns)
-            df.to_csv(csv_file, index=False)
-        
-        # Check if already marked today
-        if not df.empty:
-            today_attendance = df[df['Date'] == current_date]
-            if name in today_attendance['Name'].values:
-                return f"{name} already marked present today"
-                
-    except FileNotFoundError:
-        # Create empty DataFrame with correct columns
-        df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        df.to_csv(csv_file, index=False)
-    except Exception as e:
-        print(f"Error reading CSV file: {e}")
-        # Create new DataFrame with correct structure
-        df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        df.to_csv(csv_file, index=False)
-    
-    # Mark attendance
-    new_entry = pd.DataFrame({
-        "Name": [name],
-        "Time": [current_time_str], 
-        "Date": [current_date]
-    })
-    
-    # Read the current file again to ensure we have the latest data
-    try:
-        df = pd.read_csv(csv_file)
-    except:
-        df = pd.DataFrame(columns=["Name", "Time", "Date"])
-    
-    df = pd.concat([df, new_entry], ignore_index=True)
-    df.to_csv(csv_file, index=False)
+    newly_marked, is_late, current_time_str = attendance_log.mark(name)
     
-    # Check if late (after 9 AM)
-    if current_time.hour >= 9:
-        try:
-            late_df = pd.read_csv(late_file)
-            # Check if late file has correct format
-            if not all(col in late_df.columns for col in ["Name", "Time", "Date"]):
-                late_df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        except FileNotFoundError:
-            late_df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        except Exception:
-            late_df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        
-        late_df = pd.concat([late_df, new_entry], ignore_index=True)
-        late_df.to_csv(late_file, index=False)
+    if not newly_marked:
+        return f"{name} already marked present today"
+    if is_late:
         return f"{name} marked present (LATE) at {current_time_str}"
-    
     return f"{name} marked present at {current_time_str}"
 
 def main():
     """Main attendance recognition loop"""
+    threading.Thread(target=tts_worker, daemon=True).start()
+    
     # Initialize system
-    cap, face_cascade, face_recognizer, label_names = initialize_system()
+    cap, face_cascade, recognizer, label_names = initialize_system()
     
     if cap is None:
         return
     
-    # Set up CSV files
-    csv_file = "Attendance/Attendance_.csv"
-    late_file = "Attendance/late_attendance_record.csv"
-    
-    # Initialize CSV files with correct format
-    os.makedirs("Attendance", exist_ok=True)
-    
-    # Check and fix attendance file format
-    try:
-        df = pd.read_csv(csv_file)
-        expected_columns = ["Name", "Time", "Date"]
-        if not all(col in df.columns for col in expected_columns):
-            print("Converting old CSV format to new format...")
-            df = pd.DataFrame(columns=expected_columns)
-            df.to_csv(csv_file, index=False)
-    except FileNotFoundError:
-        df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        df.to_csv(csv_file, index=False)
-    except Exception as e:
-        print(f"Creating new attendance file due to error: {e}")
-        df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        df.to_csv(csv_file, index=False)
-    
-    # Check and fix late attendance file format
-    try:
-        late_df = pd.read_csv(late_file)
-        if not all(col in late_df.columns for col in expected_columns):
-            late_df = pd.DataFrame(columns=expected_columns)
-            late_df.to_csv(late_file, index=False)
-    except FileNotFoundError:
-        late_df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        late_df.to_csv(late_file, index=False)
-    except Exception:
-        late_df = pd.DataFrame(columns=["Name", "Time", "Date"])
-        late_df.to_csv(late_file, index=False)
+    # Set up CSV files (kept open for appending; already-marked names held in memory)
+    attendance_log = AttendanceLog()
     
     print("System ready! Students can now approach the camera for attendance.")
-    print("Press 'q' to quit")
+    print("Press Ctrl+C to quit" if HEADLESS else "Press 'q' to quit")
     
     # Recognition parameters
-    confidence_threshold = 150  # Increased from 100 to 150
     last_recognition_time = {}  # To avoid multiple recognitions of same person
     recognition_cooldown = 10  # seconds
     
-    while True:
-        ret, frame = cap.read()
+    frame_idx = 0
+    tracks = []  # [tracker, box] per face found on the last detection frame
+    roi_buffer = np.empty((4, SAMPLE_SIZE, SAMPLE_SIZE), dtype=np.uint8)  # reused face crops
+    
+    # Raw YUYV frames carry the grayscale image as their Y plane, saving a BGR->gray pass
+    raw_yuyv = enable_raw_yuyv(cap)
+    
+    # Camera reads run on their own thread, overlapping detection and recognition
+    grabber = FrameGrabber(cap)
+    
+    # Ctrl+C ends the loop cleanly (the only way out without a window)
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    
+    while not stop.is_set():
+        ret, frame = grabber.read()
         
         if not ret:
             print("Error reading frame")
             continue
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Convert to grayscale once; detection and recognition both use it
+        if raw_yuyv:
+            gray, frame = split_yuyv(frame)
+        else:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
-        # Detect faces
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+        if frame_idx % DETECT_INTERVAL == 0:
+            # Detect faces on a downscaled frame, then start a tracker per face
+            # With OpenCL the downscale and the cascade run on the GPU; ROIs still come from gray
+            detect_input = cv2.UMat(gray) if USE_OPENCL else gray
+            small = cv2.resize(detect_input, (0, 0), fx=1 / DETECTION_SCALE, fy=1 / DETECTION_SCALE,
+                               interpolation=cv2.INTER_AREA)
+            tracks = []
+            # 30-200 px on the half-size frame = 60-400 px faces, so fewer pyramid levels
+            for box in face_cascade.detectMultiScale(small, 1.3, 5, minSize=(30, 30), maxSize=(200, 200)):
+                box = tuple(int(v) * DETECTION_SCALE for v in box)
+                tracker = create_tracker()
+                if tracker is not None:
+                    tracker.init(frame, box)
+                tracks.append([tracker, box])
+        else:
+            # Between detections just follow the faces already found
+            for track in tracks:
+                if track[0] is not None:
+                    ok, box = track[0].update(frame)
+                    if ok:
+                        track[1] = tuple(int(v) for v in box)
+        frame_idx += 1
         
         current_time = datetime.now()
         
-        for (x, y, w, h) in faces:
-            # Extract face region
-            face_roi = gray[y:y+h, x:x+w]
-            
-            # Resize to match training data
-            face_roi = cv2.resize(face_roi, (50, 50))
-            
-            # Recognize face
-            label, confidence = face_recognizer.predict(face_roi)
-            
-            # Draw rectangle around face
-            color = (0, 255, 0) if confidence < confidence_threshold else (0, 0, 255)
-            cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
-            
-            if confidence < confidence_threshold and label in label_names:
+        # Resize every face into the reused buffer (tracked boxes can drift past the frame edge)
+        if len(tracks) > len(roi_buffer):
+            roi_buffer = np.empty((len(tracks), SAMPLE_SIZE, SAMPLE_SIZE), dtype=np.uint8)
+        boxes = []
+        frame_h, frame_w = gray.shape[:2]
+        for _, (x, y, w, h) in tracks:
+            # Clip both corners to the frame so the box is exactly the visible part of the face
+            x2, y2 = min(x + w, frame_w), min(y + h, frame_h)
+            x, y = max(x, 0), max(y, 0)
+            w, h = x2 - x, y2 - y
+            if w <= 0 or h <= 0:
+                continue
+            crop_sample(gray, (x, y, w, h), dst=roi_buffer[len(boxes)])
+            boxes.append((x, y, w, h))
+        
+        # Recognize all faces at once: correlation with every stored sample, best one wins
+        matches = recognizer.match(face_vectors(roi_buffer[:len(boxes)])) if boxes else ([], [])
+        
+        for (x, y, w, h), label, confidence in zip(boxes, *matches):
+            if confidence > MATCH_THRESHOLD and label in label_names:
                 name = label_names[label]
                 
                 # Check cooldown
@@ -249,22 +254,27 @@ def main():
                    (current_time - last_recognition_time[name]).seconds > recognition_cooldown:
                     
                     # Mark attendance
-                    result = mark_attendance(name, csv_file, late_file)
+                    result = mark_attendance(name, attendance_log)
                     print(result)
                     speak(f"Hello {name}")
                     
                     last_recognition_time[name] = current_time
-                    
-                    # Display name
-                    cv2.putText(frame, f"{name} - Present", (x, y-10), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+                    status = f"{name} - Present"
                 else:
-                    cv2.putText(frame, f"{name} - Already marked", (x, y-10), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+                    status = f"{name} - Already marked"
             else:
-                cv2.putText(frame, "Unknown", (x, y-10), 
+                status = "Unknown"
+            
+            # Draw rectangle around face and display name
+            if not HEADLESS:
+                color = (0, 255, 0) if confidence > MATCH_THRESHOLD else (0, 0, 255)
+                cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+                cv2.putText(frame, status, (x, y-10), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
         
+        if HEADLESS:
+            continue
+        
         # Display info
         cv2.putText(frame, f"Registered Students: {len(label_names)}", (10, 30), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
@@ -279,8 +289,10 @@ def main():
             break
     
     # Cleanup
+    grabber.stop()
     cap.release()
     cv2.destroyAllWindows()
+    attendance_log.close()
     print("Attendance system stopped.")
 
 if __name__ == "__main__":
@@ -3,9 +3,10 @@
 Database Reset Script
 This script clears all student data and attendance records for a fresh start
 """
+import csv
 import sqlite3
 import os
-import pandas as pd
+import shutil
 from datetime import datetime
 
 def clear_database():
@@ -43,15 +44,13 @@ def backup_attendance_data():
         # Backup attendance file
         if os.path.exists('Attendance/Attendance_.csv'):
             backup_file = f"Attendance/Attendance_backup_{timestamp}.csv"
-            df = pd.read_csv('Attendance/Attendance_.csv')
-            df.to_csv(backup_file, index=False)
+            shutil.copy2('Attendance/Attendance_.csv', backup_file)
             print(f"📄 Attendance data backed up to: {backup_file}")
         
         # Backup late attendance file  
         if os.path.exists('Attendance/late_attendance_record.csv'):
             backup_file = f"Attendance/late_attendance_backup_{timestamp}.csv"
-            df = pd.read_csv('Attendance/late_attendance_record.csv')
-            df.to_csv(backup_file, index=False)
+            shutil.copy2('Attendance/late_attendance_record.csv', backup_file)
             print(f"📄 Late attendance data backed up to: {backup_file}")
             
     except Exception as e:
@@ -62,14 +61,14 @@ def clear_attendance_files():
     try:
         # Clear main attendance file
         if os.path.exists('Attendance/Attendance_.csv'):
-            df = pd.DataFrame(columns=["Name", "Time", "Date"])
-            df.to_csv('Attendance/Attendance_.csv', index=False)
+            with open('Attendance/Attendance_.csv', 'w', newline='') as f:
+                csv.writer(f, lineterminator='\n').writerow(["Name", "Time", "Date"])
             print("✅ Attendance file cleared")
         
         # Clear late attendance file
         if os.path.exists('Attendance/late_attendance_record.csv'):
-            df = pd.DataFrame(columns=["Name", "Time", "Date"])
-            df.to_csv('Attendance/late_attendance_record.csv', index=False)
+            with open('Attendance/late_attendance_record.csv', 'w', newline='') as f:
+                csv.writer(f, lineterminator='\n').writerow(["Name", "Time", "Date"])
             print("✅ Late attendance file cleared")
             
     except Exception as e:
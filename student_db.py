@@ -1,27 +1,19 @@
 import cv2
 import sqlite3
 import sys
-import time
-import platform
+import os
+import numpy as np
+from face_samples import SAMPLE_SIZE, crop_sample
+from camera_utils import FrameGrabber, open_camera, wait_for_camera
+from face_utils import detect_half_scale, get_cascade
 
-# Initialize video capture and face detection with Mac optimization
-print("Initializing camera...")
+# Parallel Haar cascade: use all but one core for OpenCV's worker threads
+cv2.setUseOptimized(True)
+cv2.setNumThreads(max(1, (os.cpu_count() or 1) - 1))
 
-# Mac-specific camera initialization
-if platform.system() == "Darwin":  # macOS
-    print("🍎 Detected macOS - Using optimized camera settings")
-    video = cv2.VideoCapture(0, cv2.CAP_AVFOUNDATION)
-    if video.isOpened():
-        # Test if camera works
-        ret, _ = video.read()
-        if not ret:
-            print("⚠️  Built-in camera not responding, trying default backend...")
-            video.release()
-            video = cv2.VideoCapture(0)
-    else:
-        video = cv2.VideoCapture(0)
-else:
-    video = cv2.VideoCapture(0)
+# Initialize video capture (native backend per OS, 640x480, 1-frame buffer)
+print("Initializing camera...")
+video = open_camera()
 
 # Check if camera is opened successfully
 if not video.isOpened():
@@ -32,15 +24,10 @@ if not video.isOpened():
     print("4. Try using a different camera index (0, 1, 2, etc.)")
     sys.exit(1)
 
-# Set camera properties for better compatibility
-video.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-video.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-video.set(cv2.CAP_PROP_FPS, 30)
+# Wait until the camera delivers real frames instead of a fixed delay
+wait_for_camera(video)
 
-# Wait a moment for camera to initialize
-time.sleep(2)
-
-facedetect = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
+facedetect = get_cascade()
 
 # Check if face cascade is loaded
 if facedetect.empty():
@@ -51,6 +38,8 @@ if facedetect.empty():
 
 # Connect to SQLite database (create if not exists)
 conn = sqlite3.connect('data/attendance.db')
+conn.execute("PRAGMA journal_mode=WAL")
+conn.execute("PRAGMA synchronous=NORMAL")
 cursor = conn.cursor()
 
 # Create table if not exists
@@ -58,17 +47,24 @@ cursor.execute('''CREATE TABLE IF NOT EXISTS faces
                   (id INTEGER PRIMARY KEY AUTOINCREMENT,
                    name TEXT,
                    face_data BLOB)''')
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_faces_name ON faces(name)")
+
+MAX_SAMPLES = 100
 
-# Initialize variables
-faces_data = []
+# Initialize variables: samples are resized straight into one preallocated buffer
+samples = np.empty((MAX_SAMPLES, SAMPLE_SIZE, SAMPLE_SIZE), dtype=np.uint8)
+n_saved = 0
 i = 0
 name = input("Enter Your Name: ")
 
 print(f"Starting face capture for {name}...")
 print("Position your face in front of the camera and press 'q' when done")
 
+# Camera reads run on their own thread, overlapping face detection
+grabber = FrameGrabber(video)
+
 while True:
-    ret, frame = video.read()
+    ret, frame = grabber.read()
     
     # Check if frame was read successfully
     if not ret or frame is None:
@@ -76,21 +72,17 @@ while True:
         continue
     
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = facedetect.detectMultiScale(gray, 1.3, 5)
+    # 30-200 px on the half-size frame = 60-400 px faces
+    faces = detect_half_scale(facedetect, gray, 1.3, 5, minSize=(30, 30), maxSize=(200, 200))
 
     for (x, y, w, h) in faces:
-        crop_img = frame[y:y + h, x:x + w, :]
-        resized_img = cv2.resize(crop_img, (50, 50))
-
-        # Convert image to bytes for storage in SQLite
-        resized_img_bytes = resized_img.tobytes()
-
-        # Store every 10th detected face
-        if len(faces_data) <= 100 and i % 10 == 0:
-            faces_data.append((name, resized_img_bytes))
+        # Store every 10th detected face as a grayscale 50x50 sample
+        if n_saved < MAX_SAMPLES and i % 10 == 0:
+            crop_sample(gray, (x, y, w, h), dst=samples[n_saved])
+            n_saved += 1
 
         i += 1
-        cv2.putText(frame, f"Faces Collected: {len(faces_data)}", (50, 50), cv2.FONT_HERSHEY_COMPLEX, 1, (50, 50, 255),
+        cv2.putText(frame, f"Faces Collected: {n_saved}", (50, 50), cv2.FONT_HERSHEY_COMPLEX, 1, (50, 50, 255),
                     1)
         cv2.rectangle(frame, (x, y), (x + w, y + h), (50, 50, 255), 1)
 
@@ -98,20 +90,25 @@ while True:
     k = cv2.waitKey(1)
 
     # Exit loop if 'q' is pressed or 100 faces are collected
-    if k == ord('q') or len(faces_data) == 100:
+    if k == ord('q') or n_saved == MAX_SAMPLES:
         break
 
-print(f"\nCollected {len(faces_data)} face samples for {name}")
-
-# Insert faces_data into SQLite database
-if faces_data:
-    cursor.executemany('INSERT INTO faces (name, face_data) VALUES (?, ?)', faces_data)
-    conn.commit()
-    print(f"Successfully saved {len(faces_data)} face samples to database")
+print(f"\nCollected {n_saved} face samples for {name}")
+
+# Insert the collected samples into SQLite database
+if n_saved:
+    # All samples go in as one transaction (a single journal sync)
+    conn.execute("BEGIN")
+    # memoryview rows bind as BLOBs straight from the buffer (no bytes copy per sample)
+    cursor.executemany('INSERT INTO faces (name, face_data) VALUES (?, ?)',
+                       ((name, memoryview(sample)) for sample in samples[:n_saved]))
+    conn.execute("COMMIT")
+    print(f"Successfully saved {n_saved} face samples to database")
 else:
     print("No face samples were collected")
 
 # Close video capture and SQLite connection
+grabber.stop()
 video.release()
 cv2.destroyAllWindows()
 conn.close()
@@ -1,202 +1,89 @@
 #!/usr/bin/env python3
 """
 Simple Registration Script for Web Interface
-Takes student name as command line argument
+Takes student name as command line argument, or with --serve
+registers each student name read from stdin (one per line)
 """
-import cv2
-import sqlite3
-import time
-import os
-import platform
 import sys
+from face_registration import open_faces_db, register_into
+from face_utils import get_cascade
 
-def register_student(student_name):
-    """Register a student with face data"""
+MIN_SAMPLES = 20
+
+def load_face_cascade():
+    """Load the Haar face detector, or return None if it cannot be loaded"""
+    face_cascade = get_cascade()
+    if face_cascade.empty():
+        print("❌ Error: Cannot load face cascade classifier")
+        return None
+    return face_cascade
+
+def register_student(student_name, face_cascade=None, conn=None):
+    """Register a student with face data (on conn if given, else on a connection of its own)"""
     print(f"🎯 Starting face registration for: {student_name}")
     
-    # Ensure data directory exists
-    os.makedirs('data', exist_ok=True)
+    # Load face detector (already loaded when running as a worker)
+    if face_cascade is None:
+        face_cascade = load_face_cascade()
+        if face_cascade is None:
+            return False
     
-    # Initialize camera with Mac optimization
-    cap = None
-    
-    if platform.system() == "Darwin":  # macOS
-        print("🍎 Using optimized camera settings for macOS")
-        cap = cv2.VideoCapture(0, cv2.CAP_AVFOUNDATION)
-        if cap.isOpened():
-            # Test if camera works
-            ret, _ = cap.read()
-            if not ret:
-                print("⚠️  Built-in camera not responding, trying default backend...")
-                cap.release()
-                cap = None
-    
-    # Fallback to default backend
-    if cap is None:
-        cap = cv2.VideoCapture(0)
-        
-    if not cap.isOpened():
-        print("❌ Error: Could not access camera")
+    # Connect to database (already open when running as a worker)
+    try:
+        db = conn or open_faces_db()
+    except Exception as e:
+        print(f"❌ Database error: {e}")
         return False
     
-    # Set camera properties
+    n_saved = 0
     try:
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_FPS, 30)
-        if platform.system() == "Darwin":
-            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
+        # One transaction for every sample: a single commit instead of one per row
+        with db:
+            n_saved = register_into(db.cursor(), student_name, face_cascade, min_samples=MIN_SAMPLES)
+        if n_saved:
+            print(f"✅ Successfully registered {student_name} with {n_saved} samples")
     except Exception as e:
-        print(f"Warning: Could not set camera properties: {e}")
-    
-    # Test camera
-    ret, test_frame = cap.read()
-    if not ret:
-        print("❌ Error: Camera not working properly")
-        cap.release()
-        return False
+        print(f"❌ Error saving to database: {e}")
+    finally:
+        if conn is None:
+            db.close()
     
-    print("✅ Camera is working!")
+    if n_saved:
+        print("🎉 Registration completed successfully!")
+    else:
+        print("❌ Registration failed - please try again")
     
-    # Load face detector
-    face_cascade = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
-    if face_cascade.empty():
-        print("❌ Error: Cannot load face cascade classifier")
-        cap.release()
+    return n_saved > 0
+
+def serve():
+    """Register each student name read from stdin, loading the detector and database only once"""
+    face_cascade = load_face_cascade()
+    if face_cascade is None:
         return False
     
-    # Connect to database
     try:
-        conn = sqlite3.connect('data/attendance.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''CREATE TABLE IF NOT EXISTS faces
-                          (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                           name TEXT,
-                           face_data BLOB)''')
-        conn.commit()
-        
+        conn = open_faces_db()
     except Exception as e:
         print(f"❌ Database error: {e}")
-        cap.release()
         return False
     
-    print("🎥 Camera window will open now...")
-    print("📝 Instructions:")
-    print("   - Look directly at the camera")
-    print("   - Move your head slightly for different angles")
-    print("   - Press 'q' when you have enough samples (50+)")
-    print("   - The system will auto-stop at 100 samples")
-    
-    faces_data = []
-    frame_count = 0
-    last_save_time = time.time()
-    
-    # Give camera time to adjust
-    time.sleep(1)
-    
-    while True:
-        ret, frame = cap.read()
-        
-        if not ret or frame is None:
-            print("Warning: Could not read frame")
-            continue
-        
-        frame_count += 1
-        current_time = time.time()
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Detect faces
-        faces = face_cascade.detectMultiScale(
-            gray, 
-            scaleFactor=1.1, 
-            minNeighbors=5, 
-            minSize=(30, 30)
-        )
-        
-        # Process detected faces
-        for (x, y, w, h) in faces:
-            # Crop and resize face
-            face_crop = frame[y:y+h, x:x+w]
-            face_resized = cv2.resize(face_crop, (50, 50))
-            
-            # Save face sample every 0.5 seconds to avoid duplicates
-            if current_time - last_save_time > 0.5:
-                face_bytes = face_resized.tobytes()
-                faces_data.append((student_name, face_bytes))
-                last_save_time = current_time
-                print(f"Captured sample {len(faces_data)}")
-            
-            # Draw rectangle around face
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.putText(frame, "Face Detected", (x, y-10), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-        
-        # Add status information
-        cv2.putText(frame, f"Student: {student_name}", (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(frame, f"Samples: {len(faces_data)}/100", (10, 60), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(frame, "Press 'q' to finish", (10, 90), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-        # Color coding for sample count
-        if len(faces_data) < 30:
-            color = (0, 0, 255)  # Red
-            status = "Need more samples"
-        elif len(faces_data) < 50:
-            color = (0, 255, 255)  # Yellow
-            status = "Getting better"
-        else:
-            color = (0, 255, 0)  # Green
-            status = "Good quality!"
-        
-        cv2.putText(frame, status, (10, 120), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-        
-        # Show the frame
-        cv2.imshow(f'Registration: {student_name} - Press Q to finish', frame)
-        
-        # Handle key presses
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('q') or key == ord('Q'):
-            break
-        
-        # Auto-stop at 100 samples
-        if len(faces_data) >= 100:
-            print("✅ Reached 100 samples - stopping automatically")
-            break
-    
-    # Save to database
-    success = False
-    if len(faces_data) >= 20:  # Minimum 20 samples
-        try:
-            cursor.executemany('INSERT INTO faces (name, face_data) VALUES (?, ?)', faces_data)
-            conn.commit()
-            print(f"✅ Successfully registered {student_name} with {len(faces_data)} samples")
-            success = True
-        except Exception as e:
-            print(f"❌ Error saving to database: {e}")
-    else:
-        print(f"❌ Not enough samples collected ({len(faces_data)}). Need at least 20.")
-    
-    # Cleanup
-    cap.release()
-    cv2.destroyAllWindows()
+    print("📡 Registration worker ready", flush=True)
+    for line in sys.stdin:
+        student_name = line.strip()
+        if student_name:
+            # Committed per student so the recognizers see each one as soon as it is done
+            register_student(student_name, face_cascade, conn)
+            sys.stdout.flush()
     conn.close()
-    
-    if success:
-        print("🎉 Registration completed successfully!")
-    else:
-        print("❌ Registration failed - please try again")
-    
-    return success
+    return True
 
 if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == '--serve':
+        sys.exit(0 if serve() else 1)
+    
     if len(sys.argv) != 2:
         print("Usage: python web_register.py <student_name>")
+        print("       python web_register.py --serve")
         sys.exit(1)
     
     student_name = sys.argv[1]